@@ -0,0 +1,109 @@
+import math
+import time
+import threading
+
+from collections import deque
+
+
+def _normal_cdf(x):
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+
+class StoppingAdvisor:
+    """
+    Estimates whether more rerolls are still worth it.
+
+    Scores are weighted sums of many roughly independent stats, so the score
+    distribution is tracked online as a normal (Welford mean/variance).  The
+    expected improvement over the current best from n more rolls is
+
+        E[max(best, M_n)] - best = integral from best to inf of 1 - F(x)^n dx
+
+    where M_n is the best of n new rolls and F the fitted CDF.  n comes from
+    the roll rate over `horizon` seconds.  The rate is the number of rolls in
+    the last `window` seconds over the time they took, and starts over after
+    a gap of `idle_gap` seconds so pauses don't drag it down.
+    """
+
+    def __init__(self, score, horizon=60.0, threshold=0.5, auto_stop=False, *, window=10.0, idle_gap=2.0):
+        self.score = score
+        self.horizon = horizon
+        self.threshold = threshold
+        self.auto_stop = auto_stop
+        self.window = window
+        self.idle_gap = idle_gap
+
+        self.count = 0
+        self.best = None
+        self.rate = 0.0
+
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def stddev(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def add(self, roll):
+        score = self.score(roll)
+        now = time.monotonic()
+
+        with self._lock:
+            self.count += 1
+            delta = score - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (score - self._mean)
+
+            if self.best is None or score > self.best:
+                self.best = score
+
+            times = self._times
+
+            if times and now - times[-1] > self.idle_gap:
+                times.clear()
+
+            times.append(now)
+
+            while now - times[0] > self.window:
+                times.popleft()
+
+            # Keep the last rate until there are two rolls to measure a new one from
+            if len(times) > 1 and now > times[0]:
+                self.rate = (len(times) - 1) / (now - times[0])
+
+    def expected_gain(self, n, steps=200):
+        """
+        Expected improvement of the best score after n more rolls.
+        """
+        sd = self.stddev
+
+        if n < 1 or not sd:
+            return 0.0
+
+        mean, best = self._mean, self.best
+        upper = max(best, mean + 8 * sd)
+        width = (upper - best) / steps
+
+        if width <= 0:
+            return 0.0
+
+        # Midpoint rule over [best, mean + 8sd]
+        return width * sum(
+            1 - _normal_cdf((best + (i + 0.5) * width - mean) / sd) ** n for i in range(steps))
+
+    def rolls_in_horizon(self):
+        return int(self.rate * self.horizon)
+
+    def horizon_gain(self):
+        return self.expected_gain(self.rolls_in_horizon())
+
+    def should_stop(self):
+        return self.count > 30 and self.horizon_gain() < self.threshold
+
+    def format(self):
+        if self.count < 2:
+            return ''
+
+        return f'+{self.horizon_gain():.1f}/{self.horizon:.0f}s ({self.rate:.1f}/s)'
@@ -0,0 +1,199 @@
+import sys
+import time
+import threading
+
+from collections import namedtuple, deque
+
+SampledRoll = namedtuple('SampledRoll', 'rerolls roll block timestamp')
+
+
+class BurstRoller:
+    """
+    High throughput rerolling.
+
+    A poster thread queues rerolls with non-blocking PostMessage calls, never
+    more than `max_in_flight` ahead of what the game has processed, while a
+    sampler thread reads the stat block in a tight loop and records a roll
+    every time the reroll counter moves.  Every sampled roll goes through
+    `predicate`; the first match stops the burst.
+
+    Rerolls still queued in the game when the match is found get processed
+    after it, so `restore()` waits for the counter to settle before writing
+    the match back, and writes again if the counter moved afterwards.
+    """
+
+    def __init__(self, hook, *, on_roll=None, predicate=None, on_finish=None, on_error=None,
+                 max_in_flight=2, sample_interval=0.0005, max_rolls=10000):
+        self.hook = hook
+        self.on_roll = on_roll
+        self.predicate = predicate
+        self.on_finish = on_finish
+        self.on_error = on_error or (lambda *exc_info: None)
+        self.max_in_flight = max_in_flight
+        self.sample_interval = sample_interval
+
+        # Only the most recent samples are kept during long bursts
+        self.rolls = deque(maxlen=max_rolls)
+        self.match = None
+        self.posted = 0
+        self.sampled = 0
+        self.started = None
+        self.elapsed = 0.0
+
+        self._advance = 0
+        self._step = None
+        self._running = threading.Event()
+        self._threads = ()
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    @property
+    def step(self):
+        """
+        Counter step per reroll: the calibrated one, else the smallest seen.
+        """
+        return self.hook.profile.step or self._step or 1
+
+    @property
+    def observed(self):
+        return max(self.sampled, self._advance // self.step)
+
+    @property
+    def missed(self):
+        return self.observed - self.sampled
+
+    @property
+    def rate(self):
+        return self.observed / self.elapsed if self.elapsed else 0.0
+
+    def start(self):
+        if self.running:
+            raise RuntimeError("Burst is already running")
+
+        self.rolls.clear()
+        self.match = None
+        self.posted = self.sampled = self._advance = 0
+        self._step = None
+        self.started = time.perf_counter()
+
+        self._running.set()
+        self._threads = (
+            threading.Thread(name='BurstPoster', target=self._post_loop, daemon=True),
+            threading.Thread(name='BurstSampler', target=self._sample_loop, daemon=True))
+
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, wait=True):
+        self._running.clear()
+
+        if wait:
+            for thread in self._threads:
+                if thread is not threading.current_thread():
+                    thread.join()
+
+    def _wait_settled(self, quiet=0.05, timeout=2.0):
+        # The counter has to stay put for `quiet` seconds
+        deadline = time.perf_counter() + timeout
+        last = self.hook._read_rerolls()
+        since = time.perf_counter()
+
+        while time.perf_counter() - since < quiet:
+            if time.perf_counter() > deadline:
+                raise RuntimeError("The game kept rolling after the burst stopped")
+
+            time.sleep(self.sample_interval)
+            now = self.hook._read_rerolls()
+
+            if now != last:
+                last, since = now, time.perf_counter()
+
+        return last
+
+    def restore(self, attempts=3):
+        """
+        Write the matching roll back into the game once every reroll still in
+        flight has been processed.
+        """
+        if self.match is None:
+            return None
+
+        # No more rerolls may be posted from here on
+        self._running.clear()
+
+        for thread in self._threads:
+            if thread is not threading.current_thread() and thread.name == 'BurstPoster':
+                thread.join()
+
+        for _ in range(attempts):
+            counter = self._wait_settled()
+            self.hook.write_all(block=self.match.block)
+
+            if self._wait_settled() == counter:
+                return self.match
+
+        raise RuntimeError("The game rerolled over the restored roll")
+
+    def _post_loop(self):
+        try:
+            while self.running:
+                if self.posted - self.observed < self.max_in_flight:
+                    self.hook._post_roll()
+                    self.posted += 1
+                else:
+                    time.sleep(self.sample_interval)
+        except:
+            self._running.clear()
+            self.on_error(*sys.exc_info())
+
+    def _sample(self):
+        # Counter read on both sides of the block so the pair is consistent
+        while True:
+            before = self.hook._read_rerolls()
+            roll, block = self.hook.read_block()
+
+            if self.hook._read_rerolls() == before:
+                return before, roll, block
+
+    def _record(self, counter, last, roll, block):
+        delta = (counter - last) % 0x10000
+
+        # Without a calibrated step, the smallest move seen is one reroll
+        if self._step is None or delta < self._step:
+            self._step = delta
+
+        self._advance += delta
+        self.sampled += 1
+
+        sample = SampledRoll(counter, roll, block, time.time())
+        self.rolls.append(sample)
+
+        if self.on_roll:
+            self.on_roll(sample)
+
+        if self.predicate and self.predicate(roll):
+            self.match = sample
+            self._running.clear()
+
+    def _sample_loop(self):
+        try:
+            last, _, _ = self._sample()
+
+            while self.running:
+                counter, roll, block = self._sample()
+
+                if counter != last:
+                    self._record(counter, last, roll, block)
+                    last = counter
+                else:
+                    time.sleep(self.sample_interval)
+        except:
+            self._running.clear()
+            self.on_error(*sys.exc_info())
+        finally:
+            self.elapsed = time.perf_counter() - self.started
+
+            if self.on_finish:
+                self.on_finish(self)
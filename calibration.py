@@ -0,0 +1,197 @@
+import json
+import time
+import statistics
+import platform
+
+from collections import namedtuple, Counter
+
+# step is how far the game's reroll counter moves per reroll, None if unmeasured
+Profile = namedtuple('Profile', 'press_delay press_gap interval step', defaults=(None,))
+
+DEFAULT_PROFILE = Profile(press_delay=0.05, press_gap=0.0, interval=0.1)
+
+
+def machine_key():
+    return platform.node() or 'unknown'
+
+
+class ProfileStore:
+    """
+    Calibration profiles saved per machine and game build in a json file.
+    """
+
+    def __init__(self, path='calibration.json'):
+        self.path = path
+
+    def _load_all(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, build, machine=None):
+        entry = self._load_all().get(machine or machine_key(), {}).get(build)
+        return Profile(**entry) if entry else None
+
+    def save(self, build, profile, machine=None):
+        data = self._load_all()
+        data.setdefault(machine or machine_key(), {})[build] = profile._asdict()
+
+        with open(self.path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+class Calibrator:
+    """
+    Measures the input pacing and polling rate for this machine and game.
+
+    The expected counter step per reroll is measured first with generous
+    pacing.  Then each shorter gap between messages is tried for
+    `rolls_per_step` rerolls, and the search stops at the first gap with
+    any missed or duplicated roll.  The key hold time used by real key
+    presses is searched the same way, and the polling interval comes from
+    how long the game takes to show a roll after a posted reroll.
+    """
+
+    gaps = (0.05, 0.03, 0.02, 0.01, 0.005, 0.002, 0.001, 0.0)
+    holds = (0.05, 0.03, 0.02, 0.01, 0.005, 0.002, 0.001)
+
+    def __init__(self, hook, rolls_per_step=25, timeout=0.5, report=print):
+        self.hook = hook
+        self.rolls_per_step = rolls_per_step
+        self.timeout = timeout
+        self.report = report
+
+        self.step = None
+
+    def _read_counter(self):
+        return self.hook._read_rerolls()
+
+    def _wait_counter(self, last):
+        # Presses are handled whenever the game gets to them, wait for a full
+        # step before calling one missed
+        deadline = time.perf_counter() + self.timeout
+
+        while True:
+            now = self._read_counter()
+
+            if (now - last) % 0x10000 >= self.step or time.perf_counter() > deadline:
+                return now
+
+            time.sleep(0.001)
+
+    def _measure(self, press, count):
+        missed = duplicated = 0
+        last = self._read_counter()
+        t0 = time.perf_counter()
+
+        for _ in range(count):
+            press()
+            now = self._wait_counter(last)
+            step = (now - last) % 0x10000
+
+            if step < self.step:
+                missed += 1
+            elif step > self.step:
+                duplicated += 1
+
+            last = now
+
+        return missed, duplicated, (time.perf_counter() - t0) / count
+
+    def _measure_step(self, gap=0.1, count=5):
+        steps = Counter()
+        last = self._read_counter()
+
+        for _ in range(count):
+            self.hook._press_roll(gap)
+            time.sleep(gap)
+            now = self._read_counter()
+            steps[(now - last) % 0x10000] += 1
+            last = now
+
+        step = steps.most_common(1)[0][0]
+
+        if not step:
+            raise RuntimeError("The game is not responding to rerolls")
+
+        return step
+
+    def _search(self, name, values, press):
+        """
+        Return (value, seconds per roll) for the smallest value that still
+        gives exactly one roll per reroll, or None if none does.
+        """
+        best = None
+
+        for value in values:
+            missed, duplicated, per_roll = self._measure(lambda: press(value), self.rolls_per_step)
+            self.report(f"{name} {value*1000:.0f} ms: {per_roll*1000:.1f} ms/roll, "
+                        f"{missed} missed, {duplicated} duplicated")
+
+            if missed or duplicated:
+                break
+
+            best = value, per_roll
+
+        return best
+
+    def _measure_hold(self):
+        # Real key presses go to the foreground window
+        self.hook.focus_game()
+        time.sleep(0.2)
+
+        try:
+            return self._search('hold', self.holds, self.hook._press_roll_focused)
+        finally:
+            self.hook.focus_this()
+
+    def _measure_latency(self, count=10, timeout=1.0):
+        """
+        Median time from posting a reroll until the counter moves.
+        """
+        latencies = []
+
+        for _ in range(count):
+            before = self._read_counter()
+            t0 = time.perf_counter()
+            self.hook._post_roll()
+
+            while self._read_counter() == before:
+                if time.perf_counter() - t0 > timeout:
+                    raise RuntimeError("The game is not responding to posted rerolls")
+
+            latencies.append(time.perf_counter() - t0)
+
+            # Let the second posted message settle before the next sample
+            time.sleep(0.05)
+
+        return statistics.median(latencies)
+
+    def run(self):
+        self.step = self._measure_step()
+        self.report(f"Calibrating, {self.step} counter step(s) per reroll")
+
+        best = self._search('gap', self.gaps, self.hook._press_roll)
+
+        if best is None:
+            raise RuntimeError("No input pacing produced reliable rolls")
+
+        gap, per_roll = best
+
+        hold = self._measure_hold()
+
+        if hold is None:
+            self.report("No key hold time produced reliable rolls, keeping the default")
+            hold = DEFAULT_PROFILE.press_delay
+        else:
+            hold = hold[0]
+
+        latency = self._measure_latency()
+        self.report(f"Rolls show up {latency*1000:.1f} ms after a posted reroll")
+
+        # Poll about twice per roll, but never slower than the old default
+        interval = min(DEFAULT_PROFILE.interval, max(0.01, min(latency, per_roll) / 2))
+
+        return Profile(press_delay=hold, press_gap=gap, interval=round(interval, 3), step=self.step)
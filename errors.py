@@ -0,0 +1,101 @@
+import time
+import queue
+import threading
+import traceback
+
+
+class ErrorLog:
+    """
+    Appends to the error file from a background thread, batching everything
+    queued within `flush_interval` into a single open/write/close.
+    """
+
+    def __init__(self, path='error.txt', flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+
+        self._thread = threading.Thread(name='ErrorLog', target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, text):
+        self._queue.put(text)
+
+    def _drain(self):
+        parts = []
+
+        while True:
+            try:
+                parts.append(self._queue.get_nowait())
+            except queue.Empty:
+                return parts
+
+    def _flush(self):
+        parts = self._drain()
+
+        if parts:
+            with open(self.path, 'a') as f:
+                f.writelines(parts)
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._closed.wait(self.flush_interval)
+            self._flush()
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+        self._flush()
+
+
+class ErrorTracker:
+    """
+    Groups exceptions by type and the location they were raised from.
+
+    Only the first occurrence of a group is written out in full, repeats are
+    counted and summarized when the count reaches a power of two.
+    """
+
+    def __init__(self, log=None):
+        self.log = log
+
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(exc_type, exc, tb):
+        while tb is not None and tb.tb_next is not None:
+            tb = tb.tb_next
+
+        if tb is None:
+            return exc_type.__name__, None, None
+
+        return exc_type.__name__, tb.tb_frame.f_code.co_filename, tb.tb_lineno
+
+    @staticmethod
+    def should_report(count):
+        return count & (count - 1) == 0
+
+    def record(self, exc_type, exc, tb):
+        key = self.key(exc_type, exc, tb)
+
+        with self._lock:
+            count = self._counts[key] = self._counts.get(key, 0) + 1
+
+        if self.log and count == 1:
+            self.log.write(''.join([
+                f"{'#' * 20} {time.asctime()} {'#' * 20}\n",
+                *traceback.format_exception(exc_type, exc, tb),
+                '\n\n']))
+
+        elif self.log and self.should_report(count):
+            name, filename, lineno = key
+            self.log.write(f"{time.asctime()}: {name} at {filename}:{lineno} repeated {count} times\n\n")
+
+        return count
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
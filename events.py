@@ -0,0 +1,211 @@
+import sys
+import time
+import threading
+
+from collections import namedtuple, deque
+
+import statinfo
+
+RollEvent = namedtuple('RollEvent', 'roll block rerolls timestamp')
+
+
+class Subscription:
+    """
+    A single subscriber on an EventBus.
+
+    Synchronous subscriptions run on the publishing thread.  Queued ones get
+    a bounded queue and their own delivery thread; when the queue is full the
+    oldest event is dropped (and counted) instead of blocking the publisher.
+    """
+
+    def __init__(self, bus, callback, *, stats=None, predicate=None, queued=False, maxsize=1000):
+        self.bus = bus
+        self.callback = callback
+        self.predicate = predicate
+        self.maxsize = maxsize
+
+        self.delivered = 0
+        self.dropped = 0
+        # Consecutive synchronous deliveries over the bus's sync budget
+        self.overruns = 0
+
+        self._stat_indexes = tuple(statinfo.names.index(s) for s in stats) if stats else ()
+        self._queue = None
+        self._cond = None
+        self._closed = False
+
+        if queued:
+            self._start_queue()
+
+    @property
+    def queued(self):
+        return self._queue is not None
+
+    def _start_queue(self):
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+        name = f'Subscriber-{getattr(self.callback, "__name__", "callback")}'
+        threading.Thread(name=name, target=self._run, daemon=True).start()
+
+    def wants(self, event, previous):
+        if self._stat_indexes and previous is not None:
+            if all(event.roll[i] == previous.roll[i] for i in self._stat_indexes):
+                return False
+
+        return self.predicate is None or self.predicate(event)
+
+    def deliver(self, event):
+        if self._closed:
+            return
+
+        if self._queue is None:
+            self._call(event)
+            return
+
+        with self._cond:
+            if len(self._queue) >= self.maxsize:
+                self._queue.popleft()
+                self.dropped += 1
+
+            self._queue.append(event)
+            self._cond.notify()
+
+    def _call(self, event):
+        try:
+            self.callback(event)
+            self.delivered += 1
+        except:
+            self.bus.on_error(*sys.exc_info())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+
+                # Closed subscriptions still get what was queued before close()
+                if not self._queue:
+                    return
+
+                event = self._queue.popleft()
+
+            self._call(event)
+
+    def demote(self):
+        """
+        Switch a synchronous subscription to queued delivery.
+        """
+        if self._queue is None:
+            self._start_queue()
+
+    def close(self):
+        if self._cond is not None:
+            with self._cond:
+                self._closed = True
+                self._cond.notify()
+
+        self._closed = True
+
+
+class EventBus:
+    """
+    Publishes one RollEvent per distinct roll to its subscribers.
+
+    Synchronous subscribers that take longer than `sync_budget` seconds
+    `overrun_limit` times in a row are moved to queued delivery, so one
+    slow call (a GC pause, say) doesn't demote a subscriber but a slow one
+    can't keep stalling the publisher.
+
+    Publishing is serialized: events reach synchronous subscribers one at a
+    time and in publish order, whichever threads publish them, so those
+    subscribers need no locking of their own.  The subscriber list has its
+    own lock, not held during delivery, so callbacks may subscribe,
+    unsubscribe or publish themselves (a nested publish is delivered inline).
+    """
+
+    def __init__(self, *, sync_budget=0.005, overrun_limit=3, on_error=None):
+        self.sync_budget = sync_budget
+        self.overrun_limit = overrun_limit
+        self.on_error = on_error or (lambda *exc_info: None)
+
+        self.published = 0
+
+        self._subscriptions = ()
+        self._last = None
+        self._lock = threading.Lock()
+        self._publish_lock = threading.RLock()
+
+    def subscribe(self, callback, *, stats=None, predicate=None, queued=False, maxsize=1000):
+        """
+        Subscribe to roll events.
+
+        stats:     only deliver when one of these stats changed
+        predicate: only deliver events for which predicate(event) is true
+        queued:    deliver on a separate thread through a bounded queue
+        """
+        sub = Subscription(self, callback, stats=stats, predicate=predicate,
+                           queued=queued, maxsize=maxsize)
+
+        with self._lock:
+            self._subscriptions += (sub,)
+
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions = tuple(s for s in self._subscriptions if s is not sub)
+
+        sub.close()
+
+    @property
+    def last(self):
+        return self._last
+
+    def publish(self, roll, block, rerolls=None, timestamp=None):
+        """
+        Publish a roll, returning the event or None if it was the same roll as last time.
+        """
+        with self._publish_lock:
+            with self._lock:
+                previous = self._last
+
+                if previous is not None and previous.roll == roll:
+                    return None
+
+                event = self._last = RollEvent(roll, block, rerolls, timestamp or time.time())
+                self.published += 1
+                subscriptions = self._subscriptions
+
+            for sub in subscriptions:
+                try:
+                    if not sub.wants(event, previous):
+                        continue
+                except:
+                    self.on_error(*sys.exc_info())
+                    continue
+
+                if sub.queued:
+                    sub.deliver(event)
+                    continue
+
+                t0 = time.perf_counter()
+                sub.deliver(event)
+
+                if time.perf_counter() - t0 <= self.sync_budget:
+                    sub.overruns = 0
+                    continue
+
+                sub.overruns += 1
+
+                if sub.overruns >= self.overrun_limit:
+                    sub.demote()
+
+        return event
+
+    def close(self):
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, ()
+
+        for sub in subscriptions:
+            sub.close()
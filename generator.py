@@ -0,0 +1,182 @@
+import numpy as np
+
+import statinfo
+
+from roll import Roll
+
+_normal_stats = tuple(stat.name for stat in statinfo.Stats.all_normal_stats())
+_normal_columns = [statinfo.names.index(name) for name in _normal_stats]
+_body_columns = [statinfo.names.index(name) for name in ('Height', 'Weight', 'Physique')]
+
+
+def _dice_pmf():
+    # Assumed shape of an unobserved stat: 3d6, values 3 to 18
+    pmf = np.zeros(19)
+
+    for a in range(1, 7):
+        for b in range(1, 7):
+            for c in range(1, 7):
+                pmf[a + b + c] += 1
+
+    return pmf / pmf.sum()
+
+
+default_pmf = _dice_pmf()
+
+
+# Slots in each stat's lookup table, so probabilities are kept to 1/4096
+_LEVELS = 4096
+
+# Weights are scaled to integers with the largest at this, scores are then int32
+_WEIGHT_SCALE = 1000
+
+
+def _lookup_table(pmf):
+    """
+    Inverse CDF as a table: a uniform index below _LEVELS picks a value.
+    Every possible value gets at least one slot however rare it is.
+    """
+    slots = np.floor(pmf / pmf.sum() * _LEVELS).astype(np.int64)
+    slots[(pmf > 0) & (slots == 0)] = 1
+    slots[np.argmax(pmf)] += _LEVELS - slots.sum()
+
+    return np.repeat(np.arange(len(pmf), dtype=np.uint8), slots)
+
+
+class StatGenerator:
+    """
+    Generates custom rolls in batches.
+
+    Each normal stat is drawn from its distribution truncated to the
+    constraint bounds, so every candidate is in bounds and nothing is
+    rejected.  The distributions come from the session histograms once there
+    are `min_samples` rolls, before that a 3d6 shape is assumed.  Drawing is
+    a uint16 index into a per stat uint8 lookup table (see _lookup_table),
+    no floats involved.
+
+    Height, Weight and Physique are drawn together as one triple seen in a
+    real roll this session, so they are always consistent with each other.
+    """
+
+    def __init__(self, histograms=None, *, min_samples=50, body_size=4096, seed=None):
+        self.histograms = histograms
+        self.min_samples = min_samples
+        self.rng = np.random.default_rng(seed)
+
+        self._bodies = np.zeros((body_size, 3), dtype=np.int16)
+        self._body_count = 0
+
+    def add(self, roll):
+        self._bodies[self._body_count % len(self._bodies)] = [roll[i] for i in _body_columns]
+        self._body_count += 1
+
+    def on_event(self, event):
+        self.add(event.roll)
+
+    def pmfs(self):
+        """
+        (stat, value) probability matrix for the normal stats, values 0 to 18.
+        """
+        if self.histograms is None or self.histograms.total < self.min_samples:
+            return np.tile(default_pmf, (len(_normal_stats), 1))
+
+        counts = np.array([self.histograms.get(name) for name in _normal_stats], dtype=float)
+        return counts / counts.sum(axis=1, keepdims=True)
+
+    def tables(self, bounds=None):
+        """
+        (stat, _LEVELS) uint8 lookup tables for the normal stats within bounds,
+        {stat: (low, high)}.
+        """
+        bounds = bounds or {}
+        tables = []
+
+        for name, pmf in zip(_normal_stats, self.pmfs()):
+            if name in bounds:
+                low, high = bounds[name]
+                pmf = pmf.copy()
+                pmf[:low] = pmf[high + 1:] = 0
+
+                # Bounds outside anything seen so far, fall back to uniform
+                if not pmf.any():
+                    pmf[low:high + 1] = 1
+
+            tables.append(_lookup_table(pmf))
+
+        return np.array(tables)
+
+    def _bodies_for(self, base):
+        count = min(self._body_count, len(self._bodies))
+
+        if count:
+            return self._bodies[:count]
+
+        if base is not None:
+            return np.array([[base[i] for i in _body_columns]], dtype=np.int16)
+
+        raise RuntimeError("No Height/Weight/Physique seen yet")
+
+    def _draw(self, n, high):
+        return self.rng.integers(high, size=n, dtype=np.uint16 if high <= 0x10000 else np.int64)
+
+    def generate(self, n, bounds=None, base=None):
+        """
+        Return an (n, 14) array of rolls in statinfo.names order.
+
+        bounds: {stat: (low, high)} for the normal stats
+        base:   roll to take Height, Weight and Physique from if no roll
+                has been seen yet
+        """
+        tables = self.tables(bounds)
+        bodies = self._bodies_for(base)
+        rolls = np.empty((n, len(statinfo.names)), dtype=np.int16)
+
+        for column, table in zip(_normal_columns, tables):
+            rolls[:, column] = table[self._draw(n, _LEVELS)]
+
+        rolls[:, _body_columns] = bodies[self._draw(n, len(bodies))]
+        return rolls
+
+    def best(self, n=1_000_000, bounds=None, score=None, base=None):
+        """
+        Sample n candidates and return the highest scoring one by score's
+        weights (or the first one without a score) as a Roll.
+
+        This picks among plausible rolls, it doesn't maximize: the larger n
+        the closer the pick gets to the top of every stat's range.  Only the
+        draws and an int32 score per candidate are kept, the winner is
+        rebuilt from its draws.
+        """
+        if score is None:
+            return Roll(self.generate(1, bounds, base)[0].tolist())
+
+        tables = self.tables(bounds)
+        bodies = self._bodies_for(base)
+
+        weights = np.asarray(score.weights, dtype=float)
+        peak = np.abs(weights).max() or 1.0
+        weights = np.round(weights / peak * _WEIGHT_SCALE).astype(np.int32)
+
+        # Each table slot's and each body's score, looked up per draw
+        stat_scores = tables.astype(np.int32) * weights[_normal_columns, None]
+        body_scores = bodies.astype(np.int32) @ weights[_body_columns]
+
+        body_draws = self._draw(n, len(bodies))
+        scores = body_scores[body_draws]
+        draws = []
+
+        for stat_score in stat_scores:
+            draw = self._draw(n, _LEVELS)
+            scores += stat_score[draw]
+            draws.append(draw)
+
+        index = int(np.argmax(scores))
+        roll = [0] * len(statinfo.names)
+
+        for column, table, draw in zip(_normal_columns, tables, draws):
+            roll[column] = int(table[draw[index]])
+
+        for column, value in zip(_body_columns, bodies[body_draws[index]]):
+            roll[column] = int(value)
+
+        return Roll(roll)
@@ -0,0 +1,149 @@
+import statinfo
+
+# Number of counters per stat, values past the end land in the last one
+_sizes = {'Height': 128, 'Weight': 512, 'Physique': 8}
+_default_size = 19
+
+_bar_width = 18
+
+
+def ordinal(n):
+    if 10 <= n % 100 <= 20:
+        return f'{n}th'
+
+    return f"{n}{ {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th') }"
+
+
+class StatHistograms:
+    """
+    Session histograms for every stat, as fixed-size counter lists.
+
+    Alongside the counts each stat keeps a Fenwick tree of cumulative counts,
+    so percentiles cost O(log bins), and its current bar sizes with a version
+    that changes whenever one of them does, so render_key() doesn't have to
+    look at every bin.  Only a new peak count rescales every bar.
+    """
+
+    def __init__(self):
+        self.counts = [[0] * _sizes.get(name, _default_size) for name in statinfo.names]
+        self.total = 0
+
+        self._index = {name: i for i, name in enumerate(statinfo.names)}
+        self._rebuild()
+
+    def _rebuild(self):
+        self._trees = [[0] * (len(counts) + 1) for counts in self.counts]
+        self._peaks = [max(counts) for counts in self.counts]
+        self._bars = [self._bar_sizes(counts, peak) for counts, peak in zip(self.counts, self._peaks)]
+        self._versions = [0] * len(self.counts)
+
+        for tree, counts in zip(self._trees, self.counts):
+            for value, count in enumerate(counts):
+                if count:
+                    self._tree_add(tree, value, count)
+
+    @staticmethod
+    def _tree_add(tree, value, count=1):
+        i = value + 1
+
+        while i < len(tree):
+            tree[i] += count
+            i += i & -i
+
+    @staticmethod
+    def _tree_below(tree, value):
+        # Sum of the counts of values below value
+        total, i = 0, value
+
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+
+        return total
+
+    @staticmethod
+    def _bar_sizes(counts, peak):
+        return [round(count / peak * _bar_width) if count else None for count in counts]
+
+    def add(self, roll):
+        for i, (counts, value) in enumerate(zip(self.counts, roll)):
+            value = min(value, len(counts) - 1)
+            count = counts[value] = counts[value] + 1
+            self._tree_add(self._trees[i], value)
+
+            if count > self._peaks[i]:
+                self._peaks[i] = count
+                bars = self._bar_sizes(counts, count)
+
+                if bars != self._bars[i]:
+                    self._bars[i] = bars
+                    self._versions[i] += 1
+            else:
+                bar = round(count / self._peaks[i] * _bar_width)
+
+                if bar != self._bars[i][value]:
+                    self._bars[i][value] = bar
+                    self._versions[i] += 1
+
+        self.total += 1
+
+    def get(self, stat):
+        return self.counts[self._index[stat]]
+
+    def _with_counts(self, counts, total):
+        other = StatHistograms()
+        other.counts = counts
+        other.total = total
+        other._rebuild()
+        return other
+
+    def copy(self):
+        return self._with_counts([list(counts) for counts in self.counts], self.total)
+
+    def since(self, earlier):
+        """
+        Histograms of just the rolls added after `earlier`, a copy() of this.
+        """
+        counts = [[a - b for a, b in zip(now, then)] for now, then in zip(self.counts, earlier.counts)]
+        return self._with_counts(counts, self.total - earlier.total)
+
+    def percentile(self, stat, value):
+        """
+        Percentage of rolls below value, counting ties as half.
+        """
+        if not self.total:
+            return None
+
+        i = self._index[stat]
+        counts = self.counts[i]
+        value = min(value, len(counts) - 1)
+
+        return 100 * (self._tree_below(self._trees[i], value) + counts[value] / 2) / self.total
+
+    def render_key(self, stat, value):
+        """
+        Everything format() output depends on, to cheaply tell whether the
+        text would change without building it.
+        """
+        if not self.total:
+            return stat, None
+
+        return stat, value, round(self.percentile(stat, value)), self._versions[self._index[stat]]
+
+    def format(self, stat, value):
+        counts = self.get(stat)
+        seen = [v for v, count in enumerate(counts) if count]
+
+        if not seen:
+            return f'{stat}: no rolls yet'
+
+        bars = self._bars[self._index[stat]]
+        # No roll count here, so the text only changes when the bars or percentile do
+        rows = [f'{stat} {value}: {ordinal(round(self.percentile(stat, value)))} percentile', '']
+
+        for v in range(seen[0], seen[-1] + 1):
+            size = '=' * (bars[v] or 0)
+            marker = '<' if v == value else ''
+            rows.append(f'{v:>3} [{size:<{_bar_width}}]{marker}')
+
+        return '\n'.join(rows)
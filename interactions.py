@@ -17,12 +17,51 @@ class StatConstraintState:
     def __init__(self):
         self._state = defaultdict(self._default_state.copy)
 
+        # Where the stat cursor is, see listen()
+        self.panel = None
+
     def for_buffer(self, buffer):
         if buffer not in statinfo.names:
             raise NameError("No such stat")
 
         return {k:v for k,v in self._state[buffer].items() if k != 'state'}
 
+    def bounds(self, stat):
+        """
+        Return the selected (low, high) values for a stat, or None if nothing is selected.
+        """
+        full_state = self._state.get(stat)
+
+        if not full_state or full_state['state'] == self.NONE_SELECTED:
+            return None
+
+        return full_state['low'], full_state['high']
+
+    def active(self):
+        """
+        Check if any stat has a selection.
+        """
+        return any(state['state'] != self.NONE_SELECTED for state in self._state.values())
+
+    def selected(self):
+        """
+        Return {stat: (low, high)} for every normal stat with a selection.
+        """
+        return {stat.name: self.bounds(stat.name) for stat in statinfo.Stats.all_normal_stats()
+                if self.bounds(stat.name)}
+
+    def matches(self, roll):
+        """
+        Check a Roll against every selected stat range.
+        """
+        for stat in statinfo.Stats.all_normal_stats():
+            bounds = self.bounds(stat.name)
+
+            if bounds and not bounds[0] <= roll.value(stat.name) <= bounds[1]:
+                return False
+
+        return True
+
     def get_cursor_bounds(self, buffer):
         stats1, stats2, numeric, phys = statinfo.groups
         stats = stats1 + stats2
@@ -40,27 +79,28 @@ class StatConstraintState:
             return range(23, 31+1, 2)
 
     def listen(self, func):
+        """
+        Track selections around a key handler.  Needs `panel`, something with
+        a `current_stat` and a per stat `cursor(stat)` column.
+        """
         @wraps(func)
         def wrapped(event):
-            current_buffer = event.current_buffer
-            current_buffer_name = event.cli.current_buffer_name
-            self._process_event_before(event)
+            stat = self.panel.current_stat
+            key = event.key_sequence[0].key.name # non-character keys are key objects in events
+
+            if stat:
+                self._process_event_before(stat, key, self.panel.cursor(stat) - 17)
 
             x = func(event)
 
-            event.previous_buffer = current_buffer
-            event.previous_buffer_name = current_buffer_name
-            self._process_event_after(event)
+            if stat:
+                self._process_event_after(stat, key)
 
             return x
         return wrapped
 
-    def _process_event_before(self, event):
-        buffer_name = event.current_buffer.text.split(':')[0]
-        key = event.key_sequence[0].key.name # non-character keys are key objects in events
-        cursor_pos = event.current_buffer.cursor_position - 17
-
-        full_state = self._state[buffer_name]
+    def _process_event_before(self, stat, key, cursor_pos):
+        full_state = self._state[stat]
         state = full_state['state']
 
         low, high = sorted((cursor_pos, full_state['start']))
@@ -87,12 +127,8 @@ class StatConstraintState:
                 else:
                     full_state.update(state=self.RANGE_SELECTED, low=low, high=high)
 
-    def _process_event_after(self, event):
-        last_buffer_name = event.previous_buffer.text.split(':')[0]
-        key = event.key_sequence[0].key.name # non-character keys are key objects in events
-        last_cursor_pos = event.previous_buffer.cursor_position - 17
-
-        full_state = self._state[last_buffer_name]
+    def _process_event_after(self, stat, key):
+        full_state = self._state[stat]
         state = full_state['state']
 
         if key in (Keys.Up.name, Keys.Down.name):
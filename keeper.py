@@ -0,0 +1,134 @@
+import json
+import heapq
+import itertools
+import threading
+
+from collections import namedtuple
+
+import statinfo
+
+KeptRoll = namedtuple('KeptRoll', 'score seq roll block')
+
+
+class WeightedScore:
+    """
+    Weighted sum over the 14 stats.  Stats without a weight count as 0.
+    """
+
+    def __init__(self, weights=None):
+        if weights is None:
+            weights = {stat.name: 1 for stat in statinfo.Stats.all_normal_stats()}
+
+        self.weights = tuple(float(weights.get(name, 0)) for name in statinfo.names)
+
+    @classmethod
+    def for_build(cls, build):
+        import skills
+        return cls(dict(zip(statinfo.names, skills.build_weights(build))))
+
+    @classmethod
+    def load(cls, spec):
+        """
+        A score from a build name (see skills.builds) or the path of a json
+        file of {stat: weight}.
+        """
+        import skills
+
+        if spec in skills.builds:
+            return cls.for_build(spec)
+
+        with open(spec) as f:
+            weights = json.load(f)
+
+        unknown = set(weights) - set(statinfo.names)
+
+        if unknown:
+            raise ValueError(f"Unknown stats {sorted(unknown)} in {spec}")
+
+        return cls(weights)
+
+    def __call__(self, roll):
+        return sum(w * v for w, v in zip(self.weights, roll))
+
+    def __repr__(self):
+        weights = ', '.join(f'{n}={w:g}' for n, w in zip(statinfo.names, self.weights) if w)
+        return f'<WeightedScore {weights}>'
+
+
+class BestRolls:
+    """
+    Keeps the K best scoring rolls seen this session along with their raw
+    stat blocks, so any of them can be written back exactly.
+
+    Backed by a min-heap of size K, so each new roll costs O(log K).
+    """
+
+    def __init__(self, k=9, score=None):
+        self.k = k
+        self.score = score or WeightedScore()
+
+        self._heap = []
+        self._kept = set()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, roll, block):
+        """
+        Offer a roll, returning True if it was kept.
+        """
+        score = self.score(roll)
+
+        with self._lock:
+            if roll in self._kept:
+                return False
+
+            entry = KeptRoll(score, next(self._seq), roll, block)
+
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, entry)
+
+            elif score > self._heap[0].score:
+                dropped = heapq.heapreplace(self._heap, entry)
+                self._kept.discard(dropped.roll)
+
+            else:
+                return False
+
+            self._kept.add(roll)
+            return True
+
+    def best(self):
+        """
+        Kept rolls, best first.
+        """
+        with self._lock:
+            return sorted(self._heap, key=lambda e: (-e.score, e.seq))
+
+    def format(self):
+        entries = self.best()
+
+        if not entries:
+            return 'No rolls kept yet.'
+
+        lines = [f'Best {len(entries)} rolls, press 1-{len(entries)} to restore:']
+
+        for i, entry in enumerate(entries, 1):
+            values = ' '.join(f'{name[:3]} {value}' for name, value in
+                              zip(statinfo.names, entry.roll) if name != 'Physique')
+            lines.append(f'{i}. [{entry.score:.1f}] {values}')
+
+        return '\n\n'.join(lines)
+
+    def rescore(self, score):
+        with self._lock:
+            self.score = score
+            self._heap = [e._replace(score=score(e.roll)) for e in self._heap]
+            heapq.heapify(self._heap)
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+            self._kept.clear()
@@ -1,26 +1,73 @@
+import os
 import sys
-import time
-import traceback
-
-from threading import Lock
+import argparse
+import multiprocessing
 
+import keeper
 import memhook
 from ui import Ui
 
-l = Lock()
-h = memhook.Hook()
-ui = Ui(h)
 
-def exhook(*args):
-    with l:
-        with open("error.txt", 'a') as f:
-            f.write(f"{'#' * 20} {time.asctime()} {'#' * 20}\n")
-            f.writelines(traceback.format_exception(*args))
-            f.write('\n\n')
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="UnReal World Stat Roller")
+    parser.add_argument('--worker', action='store_true',
+                        help="roll and read memory in a separate process")
+    parser.add_argument('--record', metavar='PATH',
+                        help="record every roll's raw stat block to PATH")
+    parser.add_argument('--replay', metavar='PATH',
+                        help="replay a recording instead of reading the game")
+    parser.add_argument('--fast', action='store_true',
+                        help="replay as fast as possible instead of in real time")
+    parser.add_argument('--loop', action='store_true',
+                        help="restart the replay when it ends")
+    parser.add_argument('--max-fps', type=float, default=30,
+                        help="cap on screen redraws per second (default 30)")
+    parser.add_argument('--score', metavar='BUILD|PATH',
+                        help="score rolls for a build (archer, hunter, fighter, ...) or by the "
+                             "stat weights in a json file, e.g. {\"Strength\": 2, \"Agility\": 1}")
+
+    parser.add_argument('--pareto', metavar='BUILD|PATH,...', default='hunter,builder,fighter',
+                        help="objectives of the Pareto front, each a build or a json weights file "
+                             "like --score (default hunter,builder,fighter)")
+
+    args = parser.parse_args(argv)
+
+    try:
+        args.score = keeper.WeightedScore.load(args.score) if args.score else None
+    except (OSError, ValueError) as e:
+        parser.error(f"--score: {e}")
+
+    try:
+        args.pareto = {os.path.splitext(os.path.basename(spec))[0]: keeper.WeightedScore.load(spec)
+                       for spec in (s.strip() for s in args.pareto.split(',')) if spec}
+    except (OSError, ValueError) as e:
+        parser.error(f"--pareto: {e}")
+
+    return args
 
+
+def main():
+    args = parse_args()
+
+    if args.replay:
+        import recording
+        h = recording.ReplayHook(args.replay, realtime=not args.fast, loop=args.loop)
+    else:
+        h = memhook.Hook()
+
+    ui = Ui(h, use_worker=args.worker and not args.replay, record_to=args.record,
+            max_fps=args.max_fps, score=args.score, objectives=args.pareto)
+
+    def exhook(*args):
+        # Logged to error.txt by the ui's error tracker
         ui.on_error(*args)
 
-sys.excepthook = exhook
+    sys.excepthook = exhook
+
+    ui.run()
 
 
-ui.run()
+# The worker process re-imports this module on Windows
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()
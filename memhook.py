@@ -3,6 +3,7 @@ import sys
 import time
 import random
 import struct
+import operator
 import threading
 
 from collections import namedtuple
@@ -10,7 +11,7 @@ from contextlib import contextmanager
 
 import ctypes
 
-from ctypes import c_char, c_byte, c_ulong, c_void_p
+from ctypes import c_char, c_byte, c_ubyte, c_ulong, c_void_p
 from ctypes.wintypes import DWORD, BOOL, HMODULE
 
 import win32api
@@ -20,6 +21,9 @@ import win32process
 from win32con import WM_CHAR, PROCESS_ALL_ACCESS
 
 import statinfo
+import calibration
+
+from roll import Roll
 
 """
 Data structure: 48 bytes
@@ -59,8 +63,6 @@ Struct code: LLLLxBBBHBBxBBxxBBBxxBBxxxxLL
 Stat code:   LLL xxxx x x B B xx B B x B B xx B B B xx B B
 """
 
-# TODO: Struct object optimizations (especially for the full stat code)
-
 _Address = namedtuple("Address", "address size")
 
 _statmap = {
@@ -92,6 +94,23 @@ _size_to_struct = {
 
 _stat_struct = struct.Struct('LLL xxxx x x B B xx B B x B B xx B B B xx B B')
 
+_STAT_BLOCK_SIZE = 48
+
+# _stat_struct order -> statinfo.names order
+_reorder_stats = operator.itemgetter(12, 11, 3, 7, 5, 4, 6, 9, 13, 8, 10, 1, 0, 2)
+
+# (offset into the stat block, struct) for each stat, in statinfo.names order
+_stat_fields = tuple(
+    (_statmap[name].address - _statmap['Weight'].address,
+     struct.Struct(_size_to_struct[_statmap[name].size]))
+    for name in statinfo.names)
+
+# Value ranges a character creation roll can have, in statinfo.names order.
+# Past character creation the block holds other data, which rarely fits.
+_plausible_ranges = tuple(
+    {'Height': (1, 127), 'Weight': (1, 511), 'Physique': (0, 7)}.get(name, (1, 18))
+    for name in statinfo.names)
+
 _TH32CS_SNAPMODULE = 8
 
 
@@ -124,8 +143,28 @@ def _open_proc(pid):
             ctypes.windll.kernel32.CloseHandle(handle)
 
 
+class RerollStalled(RuntimeError):
+    """
+    The game didn't react to a reroll (its reroll counter didn't move).
+    """
+
+
+def decode_block(block):
+    """
+    Decode a raw stat block into a Roll.
+    """
+    return Roll(_reorder_stats(_stat_struct.unpack_from(block)))
+
+
+def is_plausible(roll):
+    """
+    Check every stat of a decoded roll is in its character creation range.
+    """
+    return all(low <= value <= high for value, (low, high) in zip(roll, _plausible_ranges))
+
+
 def get_random_stats():
-    return {name: random.randrange(1,5) for name in statinfo.names}
+    return Roll(random.randrange(1,5) for name in statinfo.names)
 
 
 class Cursor:
@@ -186,18 +225,44 @@ class Cursor:
 
 
 class Hook:
+    # (offset, bytes) inside the stat block that only match on the character
+    # creation screen.  Without one, a plausible roll is taken to mean we're
+    # on that screen.
+    screen_marker = None
+
+    # Offset of the race id inside the stat block.  Not known yet, the
+    # unknown byte report (see unknowns.py) is the place to look for it.
+    race_offset = None
+
     def __init__(self, load=True):
         self.pid = None
         self.hwnd = None
         self.base_addr = None
 
         self._delay = 0.05
+        self._press_gap = 0.0
+
+        self.profile = calibration.DEFAULT_PROFILE
+        self.profiles = calibration.ProfileStore()
 
         self._own_pid = os.getpid()
         self._own_hwnd = ctypes.windll.kernel32.GetConsoleWindow()
 
         self._last_stats = None
 
+        # Preallocated buffers for the polling read path.  The last block is
+        # kept so unchanged reads can return the previously decoded stats.
+        self._read_lock = threading.Lock()
+        self._handle = None
+        self._stat_addr = None
+        self._stat_buf = (c_ubyte * _STAT_BLOCK_SIZE)()
+        self._stat_view = memoryview(self._stat_buf).cast('B')
+        self._prev_buf = (c_ubyte * _STAT_BLOCK_SIZE)()
+        self._prev_view = memoryview(self._prev_buf).cast('B')
+        self._bytes_read = c_ulong(0)
+        self._bytes_read_ref = ctypes.byref(self._bytes_read)
+        self._decoded = None
+
         if load:
             self.reload()
 
@@ -255,6 +320,68 @@ class Hook:
     def _press_n_no_focus(self, delay=None):
         win32api.SendMessage(self.hwnd, WM_CHAR, 78)
 
+    def _press_roll_focused(self, hold=None):
+        # Real key presses, the game has to be the foreground window
+        self._press_n(hold)
+        self._press_n(hold)
+
+    def _post_roll(self):
+        # Non-blocking version of _press_roll, the game processes it whenever
+        win32api.PostMessage(self.hwnd, WM_CHAR, 78, 0)
+        win32api.PostMessage(self.hwnd, WM_CHAR, 78, 0)
+
+    def _press_roll(self, gap=None):
+        gap = self._press_gap if gap is None else gap
+
+        self._press_n_no_focus()
+
+        if gap:
+            time.sleep(gap)
+
+        self._press_n_no_focus()
+
+        if gap:
+            time.sleep(gap)
+
+    def game_build(self):
+        """
+        Identify the game build by its executable's version, or size and mtime.
+        """
+        with _open_proc(self.pid) as handle:
+            exe = win32process.GetModuleFileNameEx(handle, 0)
+
+        try:
+            info = win32api.GetFileVersionInfo(exe, '\\')
+            ms, ls = info['FileVersionMS'], info['FileVersionLS']
+            return f"{os.path.basename(exe)} {ms >> 16}.{ms & 0xFFFF}.{ls >> 16}.{ls & 0xFFFF}"
+        except Exception:
+            st = os.stat(exe)
+            return f"{os.path.basename(exe)} {st.st_size} {int(st.st_mtime)}"
+
+    def apply_profile(self, profile):
+        self.profile = profile
+        self._delay = profile.press_delay
+        self._press_gap = profile.press_gap
+
+    def load_profile(self):
+        """
+        Apply the saved calibration for this machine and game build, if any.
+        """
+        profile = self.profiles.load(self.game_build())
+
+        if profile:
+            self.apply_profile(profile)
+
+        return profile
+
+    def calibrate(self, report=print):
+        profile = calibration.Calibrator(self, report=report).run()
+
+        self.apply_profile(profile)
+        self.profiles.save(self.game_build(), profile)
+
+        return profile
+
     def _read_mem_address(self, raw_address, size, handle):
         buf = (c_byte * size)()
         bytesRead = c_ulong(0)
@@ -298,6 +425,52 @@ class Hook:
             err = ctypes.windll.kernel32.GetLastError()
             raise RuntimeError(f"Could not write address (err {err})")
 
+    def _read_stat_block(self, handle):
+        return bytes(self._read_mem_address(
+            _statmap['Weight'].address + self.base_addr, _STAT_BLOCK_SIZE, handle))
+
+    def _write_stat_block(self, data, handle):
+        self._write_address(_statmap['Weight'], data, handle)
+
+    @staticmethod
+    def pack_stats(stats, block):
+        """
+        Return a copy of the raw stat block with the stats packed into it,
+        leaving the unknown bytes untouched.
+        """
+        if isinstance(stats, dict):
+            stats = Roll.from_dict(stats)
+
+        block = bytearray(block)
+
+        for (offset, fmt), value in zip(_stat_fields, stats):
+            fmt.pack_into(block, offset, value)
+
+        return bytes(block)
+
+    def write_all(self, stats=None, *, block=None, verify=True):
+        """
+        Write a whole roll with a single WriteProcessMemory call.
+
+        If `block` is given (a raw stat block from a previous read) it is used
+        as the base for the unknown bytes, otherwise the current block is read
+        first. With no `stats` the block is restored as is.
+        """
+        if not self.is_running():
+            raise RuntimeError("Process is not running")
+
+        with _open_proc(self.pid) as handle:
+            if block is None:
+                block = self._read_stat_block(handle)
+
+            data = self.pack_stats(stats, block) if stats is not None else bytes(block)
+            self._write_stat_block(data, handle)
+
+            if verify and self._read_stat_block(handle) != data:
+                raise RuntimeError("Stat block verification failed after write")
+
+        return data
+
     def write_to_address(self, address, value):
         data = struct.pack(_size_to_struct[address.size], value)
 
@@ -315,18 +488,40 @@ class Hook:
         return win32gui.GetForegroundWindow() == self.hwnd
 
 
+    def _get_handle(self):
+        if not self._handle:
+            self._handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, False, self.pid)
+
+        return self._handle
+
+    def _close_handle(self):
+        with self._read_lock:
+            if self._handle:
+                ctypes.windll.kernel32.CloseHandle(self._handle)
+
+            self._handle = None
+            self._decoded = None
+
     def reload(self):
+        self._close_handle()
         self.hwnd = self._get_hwnd()
 
         if self.hwnd is None:
             self.hwnd = None
             self.pid = None
             self.base_addr = None
+            self._stat_addr = None
 
             return False
 
         self.pid = self._get_pid()
         self.base_addr = self._get_base_addr()
+        self._stat_addr = _statmap['Weight'].address + self.base_addr
+
+        try:
+            self.load_profile()
+        except Exception:
+            self.apply_profile(calibration.DEFAULT_PROFILE)
 
         return True
 
@@ -334,13 +529,12 @@ class Hook:
         self._last_stats = self.read_all()
         last_reroll = self._read_rerolls()
 
-        self._press_n_no_focus()
-        self._press_n_no_focus()
+        self._press_roll()
 
-        stats = self.read_all()
-        assert stats != self._last_stats
+        if self._read_rerolls() == last_reroll:
+            raise RerollStalled("The reroll counter did not change")
 
-        return stats
+        return self.read_all()
 
     def read_stat(self, stat):
         if not self.is_running():
@@ -348,14 +542,66 @@ class Hook:
 
         return self.read_address(_statmap[stat])
 
+    def _read_stat_block_into(self, handle):
+        result = ctypes.windll.kernel32.ReadProcessMemory(
+            handle, self._stat_addr, self._stat_buf, _STAT_BLOCK_SIZE, self._bytes_read_ref)
+
+        if not result:
+            err = ctypes.windll.kernel32.GetLastError()
+            raise RuntimeError(f"Could not read stat block at {self._stat_addr} (err {err})")
+
+    def _read_block(self):
+        """
+        Read the stat block into the preallocated buffer and decode it.
+
+        Returns a (Roll, raw block bytes) pair.  The pair is only rebuilt when
+        the block changed, so polling an unchanged roll allocates nothing and
+        returns the same objects.
+        """
+        with self._read_lock:
+            self._read_stat_block_into(self._get_handle())
+
+            if self._decoded is None or self._stat_view != self._prev_view:
+                ctypes.memmove(self._prev_buf, self._stat_buf, _STAT_BLOCK_SIZE)
+                self._decoded = (decode_block(self._stat_view), bytes(self._stat_view))
+
+            return self._decoded
+
     def _read_all_stats(self):
-        with _open_proc(self.pid) as handle:
-            data = self._read_mem_address(
-                _statmap['Weight'].address + self.base_addr,
-                _stat_struct.size, handle)
-        # monkaS
-        w, h, p, s, a, d, sp, e, st, ey, t, wi, i, he = _stat_struct.unpack(data)
-        return i, wi, s, e, d, a, sp, ey, he, st, t, h, w, p
+        return self._read_block()[0]
+
+    def on_creation_screen(self, roll, block):
+        """
+        Guess from an already read (roll, block) pair whether the game is on
+        the character creation screen.
+        """
+        if self.screen_marker is not None:
+            offset, marker = self.screen_marker
+            return block[offset:offset + len(marker)] == marker
+
+        return is_plausible(roll)
+
+    def read_race(self, block):
+        """
+        Race id from an already read stat block, or None if unknown.
+        """
+        if self.race_offset is None:
+            return None
+
+        return block[self.race_offset]
+
+    def read_block(self):
+        if not self.is_running():
+            raise RuntimeError("Process is not running")
+
+        return self._read_block()
+
+    @property
+    def last_read(self):
+        """
+        The (Roll, raw block) pair from the most recent read, or None.
+        """
+        return self._decoded
 
     def read_all(self, *, zip=False):
         if not self.is_running():
@@ -369,13 +615,17 @@ class Hook:
         return stats
 
     def _read_rerolls(self):
-        return self.read_address(_rerolls)
+        if not self.is_running():
+            raise RuntimeError("Process is not running")
+
+        with self._read_lock:
+            return self._read_address(_rerolls, self._get_handle())
 
     def reset_reroll_count(self, count=0):
         self.write_to_address(_rerolls, count)
 
     def zip(self, statlist):
-        return dict(zip(statinfo.names, statlist))
+        return Roll(statlist).as_dict()
 
     def focus_game(self):
         if self.hwnd:
@@ -386,9 +636,28 @@ class Hook:
 
 
 class MemReader:
-    def __init__(self, ui, interval=0.1, *, run=True):
+    """
+    Polls the stat block and hands new rolls to the ui.
+
+    Off the character creation screen, or once the block hasn't changed for
+    `quiet_after` seconds, polling drops to `idle_interval` and nothing is
+    sent to the ui until a new roll shows up on that screen.
+    """
+
+    def __init__(self, ui, interval=None, *, max_backoff=5.0, idle_interval=2.0, quiet_after=60.0,
+                 run=True):
         self.ui = ui
         self.interval = interval
+        self.max_backoff = max_backoff
+        self.idle_interval = idle_interval
+        self.quiet_after = quiet_after
+
+        self.idle = False
+        self.on_screen = True
+
+        self._error_streak = 0
+        self._last_stats = None
+        self._last_change = time.monotonic()
 
         self._should_run = run
         self._not_paused = threading.Event()
@@ -396,6 +665,19 @@ class MemReader:
 
         self._thread = threading.Thread(name='MemReader', target=self._run, daemon=True)
 
+    def _get_delay(self):
+        # Without a fixed interval, use the hook's calibrated one
+        interval = self.interval or self.ui.hook.profile.interval
+
+        if self.idle:
+            interval = max(interval, self.idle_interval)
+
+        # Exponential backoff while reads keep failing
+        if not self._error_streak:
+            return interval
+
+        return min(self.max_backoff, interval * 2 ** min(self._error_streak, 16))
+
     def _run(self):
         while self._should_run:
             if not self.ui.hook.is_running():
@@ -404,16 +686,30 @@ class MemReader:
                 continue
 
             try:
-                stats = self.ui.hook.read_all(zip=True)
+                stats, block = self.ui.hook.read_block()
+                now = time.monotonic()
+
+                on_screen = self.ui.hook.on_creation_screen(stats, block)
+
+                if on_screen != self.on_screen:
+                    self.on_screen = on_screen
+                    self.ui.on_screen_change(on_screen)
+
+                # read_block returns the same Roll while the block is unchanged
+                if on_screen and stats is not self._last_stats:
+                    self._last_stats = stats
+                    self._last_change = now
+                    self.ui.on_roll(stats, block)
 
-                self.ui.run_in_executor(self.ui.set_stats, **stats)
-                self.ui.redraw()
+                self.idle = not on_screen or now - self._last_change > self.quiet_after
+                self._error_streak = 0
 
             except:
+                self._error_streak += 1
                 self.ui.on_error(*sys.exc_info())
 
             finally:
-                time.sleep(self.interval)
+                time.sleep(self._get_delay())
                 self._not_paused.wait()
 
 
@@ -0,0 +1,184 @@
+import threading
+
+from collections import namedtuple
+
+import statinfo
+
+from keeper import WeightedScore
+
+FrontEntry = namedtuple('FrontEntry', 'values roll block')
+
+
+def dominates(a, b):
+    """
+    True if objective vector a is at least as good as b everywhere and better somewhere.
+    """
+    return a != b and all(x >= y for x, y in zip(a, b))
+
+
+class _Node:
+    """
+    kd-tree node holding one front entry, with the bounding box of its subtree.
+    Removed entries are only marked dead until the next rebuild, the boxes
+    stay as they were which is still correct, just looser.
+    """
+
+    __slots__ = ('entry', 'alive', 'left', 'right', 'low', 'high')
+
+    def __init__(self, entry, left, right):
+        self.entry = entry
+        self.alive = True
+        self.left = left
+        self.right = right
+
+        boxes = [entry.values] + [b for child in (left, right) if child for b in (child.low, child.high)]
+        self.low = tuple(map(min, zip(*boxes)))
+        self.high = tuple(map(max, zip(*boxes)))
+
+    def children(self):
+        return [child for child in (self.left, self.right) if child]
+
+
+def _build(entries, depth=0):
+    if not entries:
+        return None
+
+    axis = depth % len(entries[0].values)
+    entries = sorted(entries, key=lambda entry: entry.values[axis])
+    middle = len(entries) // 2
+
+    return _Node(entries[middle], _build(entries[:middle], depth + 1), _build(entries[middle + 1:], depth + 1))
+
+
+class ParetoFront:
+    """
+    Incrementally maintained Pareto front (all objectives maximized).
+
+    Entries live in a kd-tree over their objective values, so checking a
+    point against the front only visits subtrees whose bounding box reaches
+    above it (anything that could dominate it) or below it (anything it could
+    dominate), sub-linear in the size of the front.  New entries go into a
+    small buffer that is scanned directly, and the tree is rebuilt once the
+    buffer outgrows the square root of the front or half the tree is dead,
+    so insertions cost O(sqrt(front) log(front)) amortized.
+    """
+
+    def __init__(self, objectives):
+        self.objectives = dict(objectives)
+
+        self._tree = None
+        self._buffer = []
+        self._count = 0
+        self._dead = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_builds(cls, *builds):
+        return cls({build: WeightedScore.for_build(build) for build in builds})
+
+    @classmethod
+    def for_groups(cls, groups=None):
+        if groups is None:
+            groups = {'Mental': statinfo.groups[0], 'Physical': statinfo.groups[1]}
+
+        return cls({name: WeightedScore({stat: 1 for stat in group})
+                    for name, group in groups.items()})
+
+    def __len__(self):
+        return self._count
+
+    def evaluate(self, roll):
+        return tuple(objective(roll) for objective in self.objectives.values())
+
+    def _nodes(self, within):
+        """
+        Live tree nodes, only descending into subtrees where within(node) holds.
+        """
+        stack = [self._tree] if self._tree else []
+
+        while stack:
+            node = stack.pop()
+
+            if within(node):
+                if node.alive:
+                    yield node
+
+                stack.extend(node.children())
+
+    def _is_dominated(self, values):
+        # Something at least as good everywhere (or identical) keeps us out
+        def covers(other):
+            return all(x >= y for x, y in zip(other, values))
+
+        if any(covers(entry.values) for entry in self._buffer):
+            return True
+
+        return any(covers(node.entry.values) for node in self._nodes(lambda node: covers(node.high)))
+
+    def _remove_dominated(self, values):
+        def below(other):
+            return all(x <= y for x, y in zip(other, values))
+
+        kept = [entry for entry in self._buffer if not dominates(values, entry.values)]
+        self._count -= len(self._buffer) - len(kept)
+        self._buffer = kept
+
+        for node in list(self._nodes(lambda node: below(node.low))):
+            if dominates(values, node.entry.values):
+                node.alive = False
+                self._dead += 1
+                self._count -= 1
+
+    def _entries(self):
+        return [node.entry for node in self._nodes(lambda node: True)] + self._buffer
+
+    def push(self, roll, block=None):
+        """
+        Offer a roll, returning True if it joined the front.
+        """
+        values = self.evaluate(roll)
+
+        with self._lock:
+            if self._is_dominated(values):
+                return False
+
+            self._remove_dominated(values)
+            self._buffer.append(FrontEntry(values, roll, block))
+            self._count += 1
+
+            if len(self._buffer) ** 2 > max(self._count, 64) or self._dead * 2 > self._count:
+                self._tree = _build(self._entries())
+                self._buffer = []
+                self._dead = 0
+
+            return True
+
+    def front(self):
+        """
+        The front's entries, best total first.
+        """
+        with self._lock:
+            return sorted(self._entries(), key=lambda entry: -sum(entry.values))
+
+    def format(self):
+        entries = self.front()
+        header = f"Pareto front ({' / '.join(self.objectives)}), {len(entries)} rolls:"
+
+        if not entries:
+            return header + '\n\nNo rolls yet.'
+
+        lines = [header]
+
+        for i, entry in enumerate(entries, 1):
+            scores = ' / '.join(f'{v:.1f}' for v in entry.values)
+            values = ' '.join(f'{name[:3]} {value}' for name, value in
+                              zip(statinfo.names, entry.roll) if name != 'Physique')
+            lines.append(f'{i}. [{scores}] {values}')
+
+        return '\n\n'.join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._tree = None
+            self._buffer = []
+            self._count = self._dead = 0
@@ -0,0 +1,165 @@
+import os
+import sys
+import time
+import marshal
+import threading
+
+from collections import Counter, defaultdict
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every running thread (MemReader, executor threads,
+    the ui thread) so a capture can be started and stopped at any time
+    without restarting the program under cProfile.
+
+    On stop two files are written:
+        <name>.prof       pstats compatible (pstats.Stats / snakeviz)
+        <name>.collapsed  one "thread;frame;frame count" line per stack,
+                          usable by flamegraph.pl, speedscope, etc.
+    """
+
+    def __init__(self, interval=0.005, directory='profiles'):
+        self.interval = interval
+        self.directory = directory
+
+        # Paths written by the last dump()
+        self.files = None
+
+        self._samples = Counter()
+        self._sample_count = 0
+        self._started = None
+        self._t0 = None
+        self._elapsed = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def sample_count(self):
+        return self._sample_count
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            raise RuntimeError("Profiler is already running")
+
+        self._samples.clear()
+        self._sample_count = 0
+        self._stop_event.clear()
+        self._started = time.time()
+        self._t0 = time.perf_counter()
+        self._elapsed = 0.0
+
+        self._thread = threading.Thread(name='Profiler', target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            raise RuntimeError("Profiler is not running")
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._elapsed = time.perf_counter() - self._t0
+
+        return self.dump()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._t0 if self.running else self._elapsed
+
+    def toggle(self):
+        """
+        Start or stop a capture, returning whether one is now running.  The
+        files written on stop are in `files`.
+        """
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+        return self.running
+
+    def _run(self):
+        own_ident = threading.get_ident()
+
+        while not self._stop_event.is_set():
+            names = {t.ident: t.name for t in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+
+                stack.reverse()
+                self._samples[(names.get(ident, str(ident)), tuple(stack))] += 1
+
+            self._sample_count += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _func_key(code):
+        return code.co_filename, code.co_firstlineno, code.co_name
+
+    @staticmethod
+    def _func_label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _build_pstats(self):
+        # func -> [cc, nc, tt, ct, callers]
+        stats = defaultdict(lambda: [0, 0, 0.0, 0.0, defaultdict(lambda: [0, 0, 0.0, 0.0])])
+
+        # Sleeps overshoot the interval and sampling itself takes time, so
+        # spread the measured wall time over the samples instead
+        sample_time = self.elapsed / self._sample_count if self._sample_count else self.interval
+
+        for (_, stack), count in self._samples.items():
+            weight = count * sample_time
+            keys = [self._func_key(code) for code in stack]
+
+            if not keys:
+                continue
+
+            for func in set(keys):
+                entry = stats[func]
+                entry[0] += count
+                entry[1] += count
+                entry[3] += weight
+
+            stats[keys[-1]][2] += weight
+
+            for depth, (caller, callee) in enumerate(zip(keys, keys[1:]), 2):
+                edge = stats[callee][4][caller]
+                edge[0] += count
+                edge[1] += count
+                edge[3] += weight
+
+                if depth == len(keys):
+                    edge[2] += weight
+
+        return {func: (cc, nc, tt, ct, {c: tuple(e) for c, e in callers.items()})
+                for func, (cc, nc, tt, ct, callers) in stats.items()}
+
+    def dump(self, name=None):
+        os.makedirs(self.directory, exist_ok=True)
+
+        name = name or time.strftime('profile-%Y%m%d-%H%M%S', time.localtime(self._started))
+        base = os.path.join(self.directory, name)
+
+        with open(base + '.prof', 'wb') as f:
+            marshal.dump(self._build_pstats(), f)
+
+        with open(base + '.collapsed', 'w') as f:
+            for (thread_name, stack), count in self._samples.most_common():
+                frames = ';'.join([thread_name] + [self._func_label(code) for code in stack])
+                f.write(f"{frames} {count}\n")
+
+        self.files = base + '.prof', base + '.collapsed'
+        return self.files
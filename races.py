@@ -0,0 +1,200 @@
+import json
+
+import numpy as np
+
+import statinfo
+import generator
+
+_normal_stats = tuple(stat.name for stat in statinfo.Stats.all_normal_stats())
+_normal_columns = [statinfo.names.index(name) for name in _normal_stats]
+_stat_index = {name: i for i, name in enumerate(_normal_stats)}
+_stat_range = np.arange(len(_normal_stats))
+
+_VALUES = 19
+
+# Probability floor so one unusual roll can't rule a race out completely
+_floor = 1e-4
+
+# What a roll of no particular race looks like, every race has to beat this
+_baseline_logp = np.log(np.maximum(generator.default_pmf, _floor))
+
+
+def race_name(race_id):
+    # Race ids read from the stat block, see Hook.race_offset
+    return f'Race {race_id}'
+
+
+class RacePriorStore:
+    """
+    Per race stat counts in a json file, learned from sessions where the race
+    was known: {race: {stat: [count of value 0, ..., count of value 18]}}.
+    """
+
+    def __init__(self, path='races.json'):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def learn(self, race, histograms):
+        """
+        Add histogram counts to a race's table.  Pass only rolls not learned
+        before, see StatHistograms.since.
+        """
+        data = self.load()
+        counts = data.setdefault(race, {})
+
+        for name in _normal_stats:
+            old = counts.get(name, [0] * _VALUES)
+            counts[name] = [a + b for a, b in zip(old, histograms.get(name))]
+
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+
+        return data
+
+
+class RaceTable:
+    """
+    Precomputed prior arrays for every known race, indexed [race, stat, value]
+    over the normal stats, so per roll lookups are plain array indexing.
+    """
+
+    def __init__(self, counts):
+        self.races = tuple(sorted(counts))
+        self._race_index = {race: i for i, race in enumerate(self.races)}
+
+        table = np.zeros((len(self.races), len(_normal_stats), _VALUES))
+
+        for r, race in enumerate(self.races):
+            for name, stat_counts in counts[race].items():
+                if name in _stat_index:
+                    table[r, _stat_index[name], :len(stat_counts)] = stat_counts[:_VALUES]
+
+        totals = table.sum(axis=2, keepdims=True)
+        self.pmf = np.divide(table, totals, out=np.zeros_like(table), where=totals > 0)
+        self.logp = np.log(np.maximum(self.pmf, _floor))
+
+        # Lowest and highest value seen for each race and stat, from a sample
+        # so not limits: rare values may just not have come up yet
+        seen = self.pmf > 0
+        self.low = np.where(seen.any(axis=2), seen.argmax(axis=2), 1)
+        self.high = np.where(seen.any(axis=2), _VALUES - 1 - seen[:, :, ::-1].argmax(axis=2), 18)
+        self.typical = self.pmf.argmax(axis=2)
+
+    @classmethod
+    def load(cls, store=None):
+        return cls((store or RacePriorStore()).load())
+
+    def __len__(self):
+        return len(self.races)
+
+    def index(self, race):
+        return self._race_index.get(race)
+
+    def ranges(self, race):
+        """
+        {stat: (low, high)} seen for a race's normal stats.
+        """
+        r = self._race_index[race]
+        return {name: (int(self.low[r, i]), int(self.high[r, i])) for i, name in enumerate(_normal_stats)}
+
+    def typical_values(self, race):
+        """
+        {stat: most common value} for a race's normal stats.
+        """
+        r = self._race_index[race]
+        return {name: int(self.typical[r, i]) for i, name in enumerate(_normal_stats)}
+
+    def feasibility(self, race, bounds):
+        """
+        Probability a roll of this race lands inside every {stat: (low, high)} bound.
+        """
+        r = self._race_index[race]
+        p = 1.0
+
+        for name, (low, high) in bounds.items():
+            if name in _stat_index:
+                p *= float(self.pmf[r, _stat_index[name], low:high + 1].sum())
+
+        return p
+
+    def format(self, race, stat, bounds=None):
+        """
+        One line summary for the info panel.
+        """
+        text = f'Race: {race}'
+
+        if stat in _stat_index:
+            low, high = self.ranges(race)[stat]
+            typical = self.typical_values(race)[stat]
+            text += f', {stat} seen {low}-{high} (typically {typical})'
+
+        if bounds:
+            p = self.feasibility(race, bounds)
+            text += f', constraints hit 1 in {1/p:,.0f} rolls' if p else ', constraints unreachable'
+
+        return text
+
+
+class RaceDetector:
+    """
+    Works out the character's race.
+
+    If the race can be read from the stat block (see Hook.race_offset) that wins.
+    Otherwise every roll adds its log likelihood under each race's priors,
+    a fixed cost per roll, and the best race is reported once it leads the
+    runner up by `margin` (natural log units) after at least `min_rolls`.
+    A 3d6 baseline always runs too, so a race is only reported if it
+    explains the rolls better than no race would, even with one race learned.
+    """
+
+    def __init__(self, table, *, min_rolls=20, margin=5.0):
+        self.table = table
+        self.min_rolls = min_rolls
+        self.margin = margin
+
+        self.count = 0
+        self.loglik = np.zeros(len(table))
+        self.baseline = 0.0
+        self.known = None
+
+    def reset(self):
+        self.count = 0
+        self.loglik[:] = 0
+        self.baseline = 0.0
+        self.known = None
+
+    def add(self, roll, race=None):
+        if race is not None:
+            self.known = race
+            return
+
+        if not len(self.table):
+            return
+
+        values = [min(roll[i], _VALUES - 1) for i in _normal_columns]
+        self.loglik += self.table.logp[:, _stat_range, values].sum(axis=1)
+        self.baseline += float(_baseline_logp[values].sum())
+        self.count += 1
+
+    @property
+    def race(self):
+        if self.known:
+            return self.known
+
+        if not len(self.table) or self.count < self.min_rolls:
+            return None
+
+        ranked = np.sort(self.loglik)[::-1]
+        best = ranked[0]
+        second = max(ranked[1], self.baseline) if len(ranked) > 1 else self.baseline
+
+        if best - second < self.margin:
+            return None
+
+        return self.table.races[int(self.loglik.argmax())]
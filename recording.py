@@ -0,0 +1,251 @@
+import sys
+import time
+import bisect
+import struct
+
+from collections import namedtuple
+
+import memhook
+import calibration
+
+"""
+Recording file layout (little endian):
+
+Header:  magic      4s   b'URWR'
+         version    I
+
+Record:  timestamp  d
+         rerolls    I
+         block      48s  raw stat block as read by Hook
+
+Records are appended for every new roll, so a session is 60 bytes per roll.
+"""
+
+MAGIC = b'URWR'
+VERSION = 1
+
+_header = struct.Struct('<4sI')
+_record = struct.Struct('<dI48s')
+
+Record = namedtuple('Record', 'timestamp rerolls block')
+
+
+def load(path):
+    """
+    Read a whole recording into a list of Records.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, version = _header.unpack_from(data)
+
+    if magic != MAGIC or version != VERSION:
+        raise RuntimeError(f"{path} is not a roll recording (version {VERSION})")
+
+    # Ignore a partial trailing record from an interrupted session
+    end = len(data) - (len(data) - _header.size) % _record.size
+
+    return [Record(*rec) for rec in _record.iter_unpack(data[_header.size:end])]
+
+
+class Recorder:
+    """
+    Appends every roll published on the event bus to a recording file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+
+        self._file = open(path, 'wb')
+        self._file.write(_header.pack(MAGIC, VERSION))
+
+    def add(self, block, rerolls=None, timestamp=None):
+        self._file.write(_record.pack(timestamp or time.time(), rerolls or 0, bytes(block)))
+        self.count += 1
+
+    def on_event(self, event):
+        self.add(event.block, event.rerolls, event.timestamp)
+
+    def close(self):
+        self._file.close()
+
+
+class ReplayHook(memhook.Hook):
+    """
+    A Hook fed from a recording instead of the game.
+
+    In real time mode the recorded stream plays back with its original timing
+    and rerolling skips ahead to the next recorded roll.  Otherwise every read
+    returns the next roll, as fast as it is polled.  Writes are applied to
+    the replayed block but never touch any process.
+    """
+
+    def __init__(self, path, *, realtime=True, loop=False):
+        super().__init__(load=False)
+
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+
+        self.records = load(path)
+
+        if not self.records:
+            raise RuntimeError(f"{path} has no recorded rolls")
+
+        self._times = [rec.timestamp for rec in self.records]
+        self._pos = -1
+        self._decoded_pos = None
+        self._clock = None
+
+        self.finished = False
+        self.restart()
+
+    def reload(self):
+        # Once a session played out it stays "closed", like a quit game
+        return not self.finished
+
+    def restart(self):
+        self.finished = False
+        self.hwnd = 'replay'
+        self._pos = -1
+        self._decoded = self._decoded_pos = None
+        self._clock = time.perf_counter() - self._times[0]
+
+        return True
+
+    def is_running(self):
+        return self.hwnd is not None
+
+    def is_foreground(self):
+        return True
+
+    def game_build(self):
+        return f'replay {self.path}'
+
+    def load_profile(self):
+        self.apply_profile(calibration.DEFAULT_PROFILE)
+        return None
+
+    def _get_handle(self):
+        return None
+
+    def _close_handle(self):
+        pass
+
+    def _advance(self, pos):
+        if pos >= len(self.records):
+            if not self.loop:
+                # Let the readers see the end of the session like a closed game
+                self.finished = True
+                self.hwnd = None
+                return len(self.records) - 1
+
+            self.restart()
+            pos = 0
+
+        self._pos = pos
+        return pos
+
+    def _current(self):
+        if self._pos < 0:
+            return self._advance(0)
+
+        if self.realtime:
+            now = time.perf_counter() - self._clock
+            return self._advance(max(self._pos, bisect.bisect_right(self._times, now) - 1))
+
+        return self._advance(self._pos + 1)
+
+    def _read_block(self):
+        with self._read_lock:
+            pos = self._current()
+
+            if pos != self._decoded_pos:
+                block = self.records[pos].block
+                self._decoded = (memhook.decode_block(block), block)
+                self._decoded_pos = pos
+
+            return self._decoded
+
+    def _read_rerolls(self):
+        return self.records[max(self._pos, 0)].rerolls
+
+    def _press_roll(self, gap=None):
+        # Without real time playback every read already moves to the next roll
+        if not self.realtime:
+            return
+
+        with self._read_lock:
+            pos = self._advance(self._pos + 1)
+
+            # Continue playback from the roll we skipped to
+            self._clock = time.perf_counter() - self._times[pos]
+
+    def _post_roll(self):
+        self._press_roll()
+
+    def reroll(self):
+        self._press_roll()
+        return self._read_all_stats()
+
+    def write_all(self, stats=None, *, block=None, verify=True):
+        with self._read_lock:
+            if block is None:
+                block = self.records[max(self._pos, 0)].block
+
+            data = self.pack_stats(stats, block) if stats is not None else bytes(block)
+            self._decoded = (memhook.decode_block(data), data)
+
+        return data
+
+    def reset_reroll_count(self, count=0):
+        pass
+
+
+def bench(path, repeat=1):
+    """
+    Push a recording through the per roll work the ui does (decoding, event
+    bus, constraint check, histograms and best rolls) as fast as possible and
+    report throughput and latency, so sessions can be compared across versions.
+    """
+    import events
+    import keeper
+    import histogram
+    import interactions
+
+    records = load(path)
+
+    constraints = interactions.StatConstraintState()
+    histograms = histogram.StatHistograms()
+    best_rolls = keeper.BestRolls()
+
+    def on_event(event):
+        histograms.add(event.roll)
+        best_rolls.push(event.roll, event.block)
+        constraints.matches(event.roll)
+
+    bus = events.EventBus()
+    bus.subscribe(on_event)
+
+    latencies = []
+    t0 = time.perf_counter()
+
+    for _ in range(repeat):
+        for rec in records:
+            start = time.perf_counter()
+            bus.publish(memhook.decode_block(rec.block), rec.block, rec.rerolls, rec.timestamp)
+            latencies.append(time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - t0
+    bus.close()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e6
+
+    print(f"{len(latencies)} rolls in {elapsed:.3f}s ({len(latencies)/elapsed:.0f} rolls/s)")
+    print(f"latency p50 {pct(0.5):.1f} us, p99 {pct(0.99):.1f} us, max {latencies[-1]*1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    bench(sys.argv[1], *map(int, sys.argv[2:]))
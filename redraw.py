@@ -0,0 +1,88 @@
+import sys
+import time
+import threading
+
+
+class RedrawScheduler:
+    """
+    Merges redraw requests from any thread into at most one frame per
+    `1/max_fps` seconds.
+
+    Each frame runs `on_frame` on the ui thread (through `call_soon`) to apply
+    whatever state changed since the last frame, then `invalidate` to render
+    it.  Counts of requests, frames and actual renders (see on_render) are
+    kept so the coalescing can be checked.
+    """
+
+    def __init__(self, invalidate, call_soon, *, on_frame=None, max_fps=30, on_error=None):
+        self.invalidate = invalidate
+        self.call_soon = call_soon
+        self.on_frame = on_frame
+        self.max_fps = max_fps
+        self.on_error = on_error or (lambda *exc_info: None)
+
+        self.requests = 0
+        self.frames = 0
+        self.renders = 0
+        self.started = time.perf_counter()
+
+        self._pending = threading.Event()
+        self._running = False
+        self._thread = None
+
+    @property
+    def frame_interval(self):
+        return 1 / self.max_fps if self.max_fps else 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(name='RedrawScheduler', target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._pending.set()
+
+    def request(self):
+        self.requests += 1
+        self._pending.set()
+
+    def on_render(self, *args):
+        self.renders += 1
+
+    def _frame(self):
+        try:
+            if self.on_frame:
+                self.on_frame()
+        except:
+            self.on_error(*sys.exc_info())
+        finally:
+            self.invalidate()
+
+    def _run(self):
+        last = 0.0
+
+        while True:
+            self._pending.wait()
+
+            if not self._running:
+                return
+
+            # Anything requested while we wait for the frame slot joins this frame
+            delay = last + self.frame_interval - time.perf_counter()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            self._pending.clear()
+            self.frames += 1
+            self.call_soon(self._frame)
+
+            last = time.perf_counter()
+
+    def format(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.renders / elapsed if elapsed else 0.0
+
+        return (f"{self.renders} renders ({rate:.1f}/s, cap {self.max_fps}), "
+                f"{self.frames} frames for {self.requests} redraw requests")
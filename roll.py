@@ -0,0 +1,89 @@
+import struct
+
+import statinfo
+
+_index = {name: i for i, name in enumerate(statinfo.names)}
+
+# Largest value each record field holds, see Roll.record
+_field_masks = (0xFF,) * 11 + (0xFFFF, 0xFFFF, 0xFF)
+
+
+class Roll(tuple):
+    """
+    A full set of stat values in statinfo.names order.
+
+    Rolls are plain tuples underneath, so equality and hashing work as is and
+    they can be used directly as dict keys or set members for duplicate
+    detection.  For storage each roll packs into a fixed 16 byte record:
+
+        11 normal stats (byte), Height (short), Weight (short), Physique (byte)
+
+    which doubles as the packed integer encoding (`pack`/`unpack`) and as the
+    element format for roll arrays (`to_array`/`from_array`).  Values too big
+    for their field, only seen when the stat block holds something other than
+    a roll, are masked to it instead of failing (see memhook.is_plausible).
+    """
+
+    __slots__ = ()
+
+    record = struct.Struct('<11B2HB')
+
+    def __new__(cls, values=None):
+        if values is None:
+            values = (0,) * len(statinfo.names)
+
+        self = super().__new__(cls, values)
+
+        if len(self) != len(statinfo.names):
+            raise ValueError(f"A roll has {len(statinfo.names)} values, got {len(self)}")
+
+        return self
+
+    @classmethod
+    def from_dict(cls, stats):
+        return cls(stats[name] for name in statinfo.names)
+
+    @classmethod
+    def from_record(cls, data, offset=0):
+        return cls(cls.record.unpack_from(data, offset))
+
+    @classmethod
+    def unpack(cls, packed):
+        return cls.from_record(packed.to_bytes(cls.record.size, 'little'))
+
+    @classmethod
+    def to_array(cls, rolls):
+        data = bytearray()
+
+        for roll in rolls:
+            data += roll.to_record()
+
+        return data
+
+    @classmethod
+    def from_array(cls, data):
+        for values in cls.record.iter_unpack(data):
+            yield cls(values)
+
+    def to_record(self):
+        return self.record.pack(*(value & mask for value, mask in zip(self, _field_masks)))
+
+    def pack(self):
+        return int.from_bytes(self.to_record(), 'little')
+
+    def value(self, stat):
+        return self[_index[stat]]
+
+    def replace(self, stats):
+        values = list(self)
+
+        for stat, value in stats.items():
+            values[_index[stat]] = value
+
+        return type(self)(values)
+
+    def as_dict(self):
+        return dict(zip(statinfo.names, self))
+
+    def __repr__(self):
+        return f"Roll({', '.join(f'{n}={v}' for n, v in zip(statinfo.names, self))})"
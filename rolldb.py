@@ -0,0 +1,175 @@
+import re
+import time
+import queue
+import sqlite3
+import threading
+
+import statinfo
+
+columns = {name: re.sub(r'\W', '_', name.lower()) for name in statinfo.names}
+
+# Stats that get their own index, the ones people actually put bounds on
+indexed = tuple(stat.name for stat in statinfo.Stats.all_normal_stats())
+
+_schema = [
+    f'''CREATE TABLE IF NOT EXISTS rolls (
+        id INTEGER PRIMARY KEY,
+        session INTEGER NOT NULL,
+        time REAL NOT NULL,
+        rerolls INTEGER,
+        {', '.join(f'{col} INTEGER NOT NULL' for col in columns.values())})''',
+    *(f'CREATE INDEX IF NOT EXISTS rolls_{columns[name]} ON rolls ({columns[name]})'
+      for name in indexed)
+]
+
+_insert = (f"INSERT INTO rolls (session, time, rerolls, {', '.join(columns.values())}) "
+           f"VALUES ({', '.join('?' * (len(columns) + 3))})")
+
+_condition = re.compile(r'^\s*(?P<stat>[a-z_/ ]+?)\s*(?P<op>>=|<=|==|!=|=|>|<)\s*(?P<value>\d+)\s*$', re.I)
+_joiner = re.compile(r'\s+(and|or)\s+', re.I)
+
+
+def _lookup_stat(text):
+    text = text.strip().lower()
+
+    for name in statinfo.names:
+        if text in (name.lower(), columns[name], name[:3].lower()):
+            return name
+
+    raise ValueError(f"Unknown stat '{text}'")
+
+
+def parse_query(text):
+    """
+    Turn "Strength >= 16 and Agility >= 15" into an SQL where clause and its parameters.
+    Stats can be given by name, column name or their first three letters.
+    """
+    parts = _joiner.split(text.strip())
+    clauses, params = [], []
+
+    for i, part in enumerate(parts):
+        if i % 2:
+            clauses.append(part.upper())
+            continue
+
+        match = _condition.match(part)
+
+        if not match:
+            raise ValueError(f"Could not parse condition '{part}'")
+
+        op = '=' if match['op'] == '==' else match['op']
+        clauses.append(f"{columns[_lookup_stat(match['stat'])]} {op} ?")
+        params.append(int(match['value']))
+
+    return ' '.join(clauses), params
+
+
+class RollDatabase:
+    """
+    Persists every roll into a local SQLite database.
+
+    Rolls are queued and inserted by a background thread in batches, one
+    transaction per batch, so adding a roll never touches the disk on the
+    calling thread.  Queries share their own connection, one at a time
+    (WAL mode lets them run alongside the writer).
+
+    `total` is the number of rolls in the database, counted once at open
+    and then kept up to date by the writer.
+    """
+
+    def __init__(self, path='rolls.db', batch_size=500, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session = int(time.time())
+        self.total = 0
+
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._ready = threading.Event()
+        self._query_conn = None
+        self._query_lock = threading.Lock()
+
+        self._thread = threading.Thread(name='RollDatabase', target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, roll, rerolls=None, timestamp=None):
+        self._queue.put((self.session, timestamp or time.time(), rerolls, *roll))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _get_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        conn = self._connect()
+
+        with conn:
+            for statement in _schema:
+                conn.execute(statement)
+
+        self.total = conn.execute('SELECT COUNT(*) FROM rolls').fetchone()[0]
+        self._ready.set()
+
+        try:
+            while not (self._closed.is_set() and self._queue.empty()):
+                batch = self._get_batch()
+
+                if batch:
+                    with conn:
+                        conn.executemany(_insert, batch)
+
+                    self.total += len(batch)
+        finally:
+            conn.close()
+
+    def _query(self, sql, params):
+        self._ready.wait()
+
+        with self._query_lock:
+            if self._query_conn is None:
+                self._query_conn = sqlite3.connect(self.path, check_same_thread=False)
+
+            return self._query_conn.execute(sql, params).fetchall()
+
+    def count(self, query=''):
+        """
+        Count rolls matching a query string (see parse_query), or all rolls.
+        """
+        if not query.strip():
+            self._ready.wait()
+            return self.total
+
+        where, params = parse_query(query)
+        return self._query(f'SELECT COUNT(*) FROM rolls WHERE {where}', params)[0][0]
+
+    def select(self, query, limit=10):
+        where, params = parse_query(query)
+
+        return self._query(
+            f"SELECT {', '.join(columns.values())} FROM rolls WHERE {where} LIMIT ?",
+            params + [limit])
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+
+        with self._query_lock:
+            if self._query_conn is not None:
+                self._query_conn.close()
+                self._query_conn = None
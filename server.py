@@ -0,0 +1,331 @@
+import sys
+import json
+import time
+import socket
+import threading
+
+from collections import deque
+
+import statinfo
+
+from roll import Roll
+
+
+def _encode(obj):
+    return (json.dumps(obj, separators=(',', ':')) + '\n').encode()
+
+
+def _event_message(event):
+    return _encode({'event': 'roll', 'roll': event.roll.as_dict(),
+                    'rerolls': event.rerolls, 'time': event.timestamp})
+
+
+class _Client:
+    """
+    One connected client.  Outgoing messages go through a queue bounded to
+    `queue_size`.  When it's full the oldest roll event is dropped, or the new
+    one if only replies are queued, so a slow client never blocks the
+    publisher.  Replies are never dropped; a client that lets `queue_size`
+    replies pile up without reading them is disconnected.
+    """
+
+    def __init__(self, server, sock, addr, queue_size):
+        self.server = server
+        self.sock = sock
+        self.addr = addr
+        self.queue_size = queue_size
+
+        self.subscribed = False
+        self.sent = 0
+        self.dropped = 0
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        threading.Thread(name=f'RollClient-{addr}-rx', target=self._read_loop, daemon=True).start()
+        threading.Thread(name=f'RollClient-{addr}-tx', target=self._write_loop, daemon=True).start()
+
+    def _drop_event(self):
+        # Drop the oldest roll event, keep replies
+        for i, (is_event, _) in enumerate(self._queue):
+            if is_event:
+                del self._queue[i]
+                self.dropped += 1
+                return True
+
+        return False
+
+    def push_event(self, data):
+        with self._cond:
+            if len(self._queue) >= self.queue_size and not self._drop_event():
+                self.dropped += 1
+                return
+
+            self._queue.append((True, data))
+            self._cond.notify()
+
+    def reply(self, obj):
+        with self._cond:
+            overflow = len(self._queue) >= self.queue_size and not self._drop_event()
+
+            if not overflow:
+                self._queue.append((False, _encode(obj)))
+                self._cond.notify()
+
+        if overflow:
+            self.close()
+
+    def _write_loop(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._queue and not self._closed:
+                        self._cond.wait()
+
+                    if self._closed:
+                        return
+
+                    # Send everything queued in one go
+                    data = b''.join(msg for _, msg in self._queue)
+                    self._queue.clear()
+
+                self.sock.sendall(data)
+                self.sent += 1
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def _read_loop(self):
+        try:
+            with self.sock.makefile('rb') as f:
+                for line in f:
+                    if line.strip():
+                        self.reply(self.server.handle(self, line))
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._cond.notify()
+
+        self.server._remove(self)
+
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RollServer:
+    """
+    Local TCP server speaking line delimited JSON.
+
+    Requests:  {"cmd": "subscribe"}    stream {"event": "roll", ...} for every roll
+               {"cmd": "unsubscribe"}
+               {"cmd": "read"}         current stats
+               {"cmd": "reroll"}       reroll and return the new stats
+               {"cmd": "write", "stats": {"Strength": 18, ...}}
+    Replies:   {"ok": true, ...} or {"ok": false, "error": "..."}, with the
+               request's "id" echoed back if it had one.
+    """
+
+    def __init__(self, hook, bus, *, reroll=None, host='127.0.0.1', port=47800, queue_size=256):
+        self.hook = hook
+        self.bus = bus
+        self.reroll = reroll or (hook.reroll if hook else None)
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+
+        self._clients = ()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._subscription = None
+
+    @property
+    def running(self):
+        return self._sock is not None
+
+    @property
+    def clients(self):
+        return self._clients
+
+    def start(self):
+        """
+        Start listening, raising OSError (e.g. port in use) if that fails.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        try:
+            # Never share the port, on Windows SO_REUSEADDR would let another process take it over
+            if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+
+            sock.bind((self.host, self.port))
+            sock.listen()
+        except OSError:
+            sock.close()
+            raise
+
+        self._sock = sock
+        self.port = sock.getsockname()[1]
+
+        # Queued, so encoding and fan out never run on the publishing thread
+        self._subscription = self.bus.subscribe(
+            self._broadcast, queued=True, maxsize=self.queue_size * 4)
+        threading.Thread(name='RollServer', target=self._accept_loop, daemon=True).start()
+
+    def stop(self):
+        if self._subscription:
+            self.bus.unsubscribe(self._subscription)
+            self._subscription = None
+
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+        for client in self._clients:
+            client.close()
+
+    def _accept_loop(self):
+        sock = self._sock
+
+        while True:
+            try:
+                conn, addr = sock.accept()
+            except OSError:
+                return
+
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _Client(self, conn, addr, self.queue_size)
+
+            with self._lock:
+                self._clients += (client,)
+
+    def _remove(self, client):
+        with self._lock:
+            self._clients = tuple(c for c in self._clients if c is not client)
+
+    def _broadcast(self, event):
+        # Encoded once, shared by every subscribed client
+        data = _event_message(event)
+
+        for client in self._clients:
+            if client.subscribed:
+                client.push_event(data)
+
+    def handle(self, client, line):
+        request = {}
+
+        try:
+            request = json.loads(line)
+            reply = self._dispatch(client, request)
+        except Exception as e:
+            reply = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+        if isinstance(request, dict) and 'id' in request:
+            reply['id'] = request['id']
+
+        return reply
+
+    def _dispatch(self, client, request):
+        cmd = request.get('cmd')
+
+        if cmd == 'subscribe':
+            client.subscribed = True
+            return {'ok': True}
+
+        if cmd == 'unsubscribe':
+            client.subscribed = False
+            return {'ok': True, 'dropped': client.dropped}
+
+        if cmd == 'read':
+            return {'ok': True, 'roll': self.hook.read_all().as_dict()}
+
+        if cmd == 'reroll':
+            roll = self.reroll()
+
+            if roll is None:
+                raise RuntimeError("The reroll didn't register, try again")
+
+            return {'ok': True, 'roll': Roll(roll).as_dict()}
+
+        if cmd == 'write':
+            stats = request['stats']
+            unknown = set(stats) - set(statinfo.names)
+
+            if unknown:
+                raise ValueError(f"Unknown stats {sorted(unknown)}")
+
+            roll = self.hook.read_all().replace(stats)
+            self.hook.write_all(roll)
+            return {'ok': True, 'roll': roll.as_dict()}
+
+        raise ValueError(f"Unknown command {cmd!r}")
+
+
+def bench(clients=32, rolls=20000, queue_size=256):
+    """
+    Publish rolls as fast as possible to many local subscribers and report
+    publish rate, delivery rate and drops.
+    """
+    import random
+    import events
+
+    bus = events.EventBus()
+    server = RollServer(None, bus, port=0, queue_size=queue_size)
+    server.start()
+
+    received = [0] * clients
+    socks = []
+
+    def read(i, sock):
+        with sock.makefile('rb') as f:
+            for line in f:
+                if line.startswith(b'{"event"'):
+                    received[i] += 1
+
+    for i in range(clients):
+        sock = socket.create_connection((server.host, server.port))
+        sock.sendall(_encode({'cmd': 'subscribe'}))
+        socks.append(sock)
+        threading.Thread(target=read, args=(i, sock), daemon=True).start()
+
+    while sum(c.subscribed for c in server.clients) < clients:
+        time.sleep(0.01)
+
+    samples = [Roll(random.randrange(1, 19) for _ in statinfo.names) for _ in range(1000)]
+
+    t0 = time.perf_counter()
+
+    for i in range(rolls):
+        bus.publish(samples[i % len(samples)], b'', i)
+
+    t1 = time.perf_counter()
+    time.sleep(1)
+
+    total = sum(received)
+    dropped = sum(c.dropped for c in server.clients)
+
+    print(f"{clients} clients, {rolls} rolls published in {t1-t0:.3f}s "
+          f"({rolls/(t1-t0):.0f} rolls/s)")
+    print(f"{server._subscription.dropped} dropped before fan out, "
+          f"{total} events delivered ({total/clients:.0f} per client), "
+          f"{dropped} dropped in client queues")
+
+    for sock in socks:
+        sock.close()
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    bench(*map(int, sys.argv[1:]))
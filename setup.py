@@ -8,6 +8,7 @@ options = {
     'build_exe': {
 
         'excludes': ['asyncio', 'lib2to3'],
+        'packages': ['numpy'],
         'include_msvcr': True,
         'zip_include_packages': '*',
         'zip_exclude_packages': '',
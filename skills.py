@@ -0,0 +1,100 @@
+import numpy as np
+
+import statinfo
+
+_governed_header = 'The following skills are governed by this stat:'
+
+
+def _parse_governed_skills(text):
+    """
+    Pull the governed skill list out of an extra_info entry.
+    Skills marked with * count the stat twice.
+    """
+    if _governed_header not in text:
+        return {}
+
+    listing = text.split(_governed_header, 1)[1].strip().split('\n\n', 1)[0]
+    skills = {}
+
+    for line in listing.splitlines():
+        name = line.strip().rstrip(',')
+
+        if name:
+            skills[name.rstrip('*')] = 2 if name.endswith('*') else 1
+
+    return skills
+
+
+# stat -> {skill: weight}
+stat_skills = {name: _parse_governed_skills(statinfo.extra_info.get(name, ''))
+               for name in statinfo.names}
+
+skills = tuple(sorted({skill for governed in stat_skills.values() for skill in governed}))
+
+_skill_index = {skill: i for i, skill in enumerate(skills)}
+
+# Raw stat x skill weights, rows in statinfo.names order
+weights = np.zeros((len(statinfo.names), len(skills)))
+
+for _row, _name in enumerate(statinfo.names):
+    for _skill, _weight in stat_skills[_name].items():
+        weights[_row, _skill_index[_skill]] = _weight
+
+# Columns normalized so a projected skill is the weighted average of its stats
+projection = weights / weights.sum(axis=0)
+
+builds = {
+    'archer':   {'Bow': 3, 'Crossbow': 1, 'Tracking': 2, 'Stealth': 2, 'Dodge': 1},
+    'trapper':  {'Trapping': 3, 'Tracking': 2, 'Hideworking': 2, 'Stealth': 1, 'Knife': 1},
+    'hunter':   {'Spear': 2, 'Bow': 2, 'Tracking': 2, 'Stealth': 2, 'Hideworking': 1, 'Cookery': 1},
+    'fisher':   {'Fishing': 3, 'Swimming': 1, 'Cookery': 1, 'Weatherlore': 1},
+    'builder':  {'Building': 3, 'Timbercraft': 3, 'Carpentry': 2, 'Climbing': 1},
+    'farmer':   {'Agriculture': 3, 'Herblore': 1, 'Weatherlore': 1, 'Cookery': 1},
+    'healer':   {'Physician': 3, 'Herblore': 2, 'Ritual': 1},
+    'fighter':  {'Sword': 2, 'Axe': 2, 'Shield': 2, 'Dodge': 2, 'Unarmed': 1},
+}
+
+
+def build_vector(build):
+    """
+    Skill weight vector for a build name or a {skill: weight} dict.
+    """
+    if isinstance(build, str):
+        build = builds[build]
+
+    vector = np.zeros(len(skills))
+
+    for skill, weight in build.items():
+        vector[_skill_index[skill]] = weight
+
+    return vector / vector.sum()
+
+
+def _as_array(rolls):
+    return np.asarray(rolls, dtype=np.float64)
+
+
+def project(rolls):
+    """
+    Projected skill levels for a roll (14,) or an array of rolls (n, 14).
+    """
+    return _as_array(rolls) @ projection
+
+
+def build_weights(build):
+    """
+    Per-stat weights for a build, so a roll's build score is a single dot product.
+    """
+    return projection @ build_vector(build)
+
+
+def score(rolls, build):
+    return _as_array(rolls) @ build_weights(build)
+
+
+def rank(rolls, build, top=None):
+    """
+    Indices of the rolls ordered from best to worst for a build.
+    """
+    order = np.argsort(-score(rolls, build), kind='stable')
+    return order if top is None else order[:top]
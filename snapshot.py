@@ -0,0 +1,134 @@
+import os
+import mmap
+import time
+import struct
+import tempfile
+
+from collections import namedtuple
+
+"""
+Shared memory layout (little endian, 72 bytes):
+
+ 0  magic      4s   b'URWS'
+ 4  version    I
+ 8  sequence   I    odd while a write is in progress
+12  rerolls    I
+16  timestamp  d
+24  block      48s  raw stat block as read by Hook
+
+Readers use the sequence number like a seqlock: read it, copy the payload,
+read it again and retry if it was odd or changed.
+"""
+
+MAGIC = b'URWS'
+VERSION = 1
+
+_header = struct.Struct('<4sI')
+_seq = struct.Struct('<I')
+_payload = struct.Struct('<Id48s')
+
+_SEQ_OFFSET = _header.size
+_PAYLOAD_OFFSET = _SEQ_OFFSET + _seq.size
+SIZE = _PAYLOAD_OFFSET + _payload.size
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'urw_roll_snapshot.bin')
+
+Snapshot = namedtuple('Snapshot', 'sequence rerolls timestamp block')
+
+
+def _open_map(path, create):
+    if not create:
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+
+    # Never truncate, a reader may still have the old file mapped
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+
+    try:
+        if os.fstat(fd).st_size < SIZE:
+            os.ftruncate(fd, SIZE)
+
+        return mmap.mmap(fd, SIZE, access=mmap.ACCESS_WRITE)
+    finally:
+        os.close(fd)
+
+
+class SnapshotWriter:
+    """
+    Publishes the latest stat block into a small memory mapped file.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+
+        self._map = _open_map(path, create=True)
+        # Carry on from a previous writer's sequence so readers never see it go back
+        self.sequence = _seq.unpack_from(self._map, _SEQ_OFFSET)[0] + 1 & ~1
+        _header.pack_into(self._map, 0, MAGIC, VERSION)
+
+    def publish(self, block, rerolls=None, timestamp=None):
+        self.sequence += 1
+        _seq.pack_into(self._map, _SEQ_OFFSET, self.sequence)
+
+        _payload.pack_into(self._map, _PAYLOAD_OFFSET,
+                           rerolls or 0, timestamp or time.time(), bytes(block))
+
+        self.sequence += 1
+        _seq.pack_into(self._map, _SEQ_OFFSET, self.sequence)
+
+    def on_event(self, event):
+        self.publish(event.block, event.rerolls, event.timestamp)
+
+    def close(self):
+        self._map.close()
+
+
+class SnapshotReader:
+    """
+    Reads consistent snapshots written by SnapshotWriter from any local process.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._map = _open_map(path, create=False)
+
+        magic, version = _header.unpack_from(self._map, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise RuntimeError(f"{path} is not a roll snapshot (version {VERSION})")
+
+    def read(self, timeout=0.1):
+        """
+        Return the latest Snapshot, or None if nothing was published yet.
+        """
+        deadline = None
+
+        while True:
+            before, = _seq.unpack_from(self._map, _SEQ_OFFSET)
+
+            if not before & 1:
+                rerolls, timestamp, block = _payload.unpack_from(self._map, _PAYLOAD_OFFSET)
+                after, = _seq.unpack_from(self._map, _SEQ_OFFSET)
+
+                if before == after:
+                    return Snapshot(before // 2, rerolls, timestamp, block) if before else None
+
+            # A write is in progress, let the writer finish
+            deadline = deadline or time.monotonic() + timeout
+
+            if time.monotonic() > deadline:
+                raise RuntimeError("Could not get a consistent snapshot")
+
+            time.sleep(0)
+
+    def read_roll(self):
+        """
+        Latest snapshot decoded into a Roll (needs memhook's stat layout).
+        """
+        import memhook
+
+        snap = self.read()
+        return memhook.decode_block(snap.block) if snap else None
+
+    def close(self):
+        self._map.close()
@@ -0,0 +1,126 @@
+from prompt_toolkit.layout.controls import UIControl, UIContent
+from prompt_toolkit.layout.screen import Point
+from prompt_toolkit.mouse_events import MouseEventType
+from prompt_toolkit.token import Token
+
+import statinfo
+
+# Buffer focused while a stat row is selected; the rows themselves aren't buffers
+STATS_BUFFER = 'STATS_BUFFER'
+
+# Cursor column of value 1 on a normal stat row, see Stats._fmt
+VALUE_COLUMN = 18
+
+
+def _panel_rows():
+    # Stat groups separated by a blank row, then rerolls
+    rows = []
+
+    for group in statinfo.groups:
+        rows.extend(group)
+        rows.append(None)
+
+    return rows + [statinfo.Stats.rerolls.name, None]
+
+
+class StatPanelControl(UIControl):
+    """
+    Renders every stat row from one list of values, instead of a Buffer and
+    Window per stat.
+
+    Each row keeps its own cursor column.  The focused row is whatever
+    `get_current()` names, and selected constraint ranges are highlighted
+    from the StatConstraintState.
+    """
+
+    def __init__(self, constraints, get_current, on_click=None):
+        self.constraints = constraints
+        self.get_current = get_current
+        self.on_click = on_click
+
+        self.rows = _panel_rows()
+        self._line = {stat: i for i, stat in enumerate(self.rows) if stat}
+
+        self.values = {stat: 0 for stat in self._line}
+        self.suffixes = {stat: '' for stat in self._line}
+        self.cursors = {stat: VALUE_COLUMN for stat in self._line}
+
+        self._texts = {stat: statinfo.Stats.format(stat, 0) for stat in self._line}
+        self._tokens = {}
+
+    @property
+    def current_stat(self):
+        stat = self.get_current()
+        return stat if stat in self._line else None
+
+    def set_row(self, stat, value, suffix=''):
+        """
+        Update one row, returning True if its text changed.
+        """
+        if self.values[stat] == value and self.suffixes[stat] == suffix:
+            return False
+
+        self.values[stat] = value
+        self.suffixes[stat] = suffix
+
+        text = statinfo.Stats.format(stat, value)
+        self._texts[stat] = f'{text} {suffix}' if suffix else text
+
+        return True
+
+    def cursor(self, stat):
+        return self.cursors[stat]
+
+    def set_cursor(self, stat, position):
+        self.cursors[stat] = max(0, min(position, len(self._texts[stat])))
+
+    def _row_tokens(self, stat):
+        text = self._texts[stat]
+        bounds = self.constraints.bounds(stat)
+
+        # Cached until the row text or its selected range changes
+        key = text, bounds
+        cached = self._tokens.get(stat)
+
+        if cached and cached[0] == key:
+            return cached[1]
+
+        if bounds:
+            start, end = bounds[0] + VALUE_COLUMN - 1, bounds[1] + VALUE_COLUMN
+            tokens = [(Token.Stat, text[:start]),
+                      (Token.SelectedText, text[start:end]),
+                      (Token.Stat, text[end:])]
+        else:
+            tokens = [(Token.Stat, text)]
+
+        self._tokens[stat] = key, tokens
+        return tokens
+
+    def _get_line(self, i):
+        stat = self.rows[i]
+        return self._row_tokens(stat) if stat else []
+
+    def has_focus(self, cli):
+        return cli.current_buffer_name == STATS_BUFFER
+
+    def preferred_height(self, cli, width, max_available_height, wrap_lines):
+        return len(self.rows)
+
+    def create_content(self, cli, width, height):
+        stat = self.current_stat
+        focused = stat is not None and self.has_focus(cli)
+
+        return UIContent(
+            get_line=self._get_line,
+            line_count=len(self.rows),
+            cursor_position=Point(x=self.cursors[stat], y=self._line[stat]) if focused else None,
+            show_cursor=focused)
+
+    def mouse_handler(self, cli, mouse_event):
+        y = mouse_event.position.y
+        stat = self.rows[y] if y < len(self.rows) else None
+
+        if mouse_event.event_type != MouseEventType.MOUSE_UP or not stat or not self.on_click:
+            return NotImplemented
+
+        self.on_click(stat, mouse_event.position.x)
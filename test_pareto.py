@@ -0,0 +1,58 @@
+import random
+
+import statinfo
+
+from keeper import WeightedScore
+from pareto import ParetoFront, dominates
+from roll import Roll
+
+
+def brute_force_front(points):
+    unique = set(points)
+    return {p for p in unique if not any(dominates(q, p) for q in unique)}
+
+
+def test_front_matches_brute_force():
+    rng = random.Random(1)
+    # One objective per stat keeps the front large enough to be interesting
+    front = ParetoFront({stat: WeightedScore({stat: 1}) for stat in statinfo.names[:4]})
+    points = []
+
+    for _ in range(2000):
+        roll = Roll([rng.randint(3, 18) for _ in range(11)] + [170, 70, 3])
+        front.push(roll)
+        points.append(front.evaluate(roll))
+
+    assert len(front) > 20
+    assert {entry.values for entry in front.front()} == brute_force_front(points)
+
+
+def test_large_front_matches_brute_force():
+    rng = random.Random(3)
+    a, b, c, d, e = statinfo.names[:5]
+    # Objectives pulling against each other give a front of about a hundred rolls
+    front = ParetoFront({'a': WeightedScore({a: 3, b: -1, c: 1}),
+                         'b': WeightedScore({b: 3, c: -1, d: 1}),
+                         'c': WeightedScore({c: 3, a: -1, e: 1})})
+    points = []
+
+    for _ in range(3000):
+        roll = Roll([rng.randint(3, 18) for _ in range(11)] + [170, 70, 3])
+        front.push(roll)
+        points.append(front.evaluate(roll))
+
+    entries = front.front()
+
+    assert len(entries) == len(front) > 50
+    assert {entry.values for entry in entries} == brute_force_front(points)
+
+
+def test_duplicates_and_dominated_rolls_rejected():
+    front = ParetoFront.for_groups()
+    roll = Roll([10] * 11 + [170, 70, 3])
+
+    assert front.push(roll)
+    assert not front.push(roll)
+    assert not front.push(roll.replace({'Strength': 9}))
+    assert front.push(roll.replace({'Strength': 11}))
+    assert len(front) == 1
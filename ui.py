@@ -1,5 +1,6 @@
 import os
 import re
+import sys
 import time
 import bisect
 import textwrap
@@ -24,9 +25,30 @@ from prompt_toolkit.shortcuts import create_eventloop
 from prompt_toolkit.token import Token
 
 import scroll
+import errors
 import memhook
+import profiler
 import statinfo
+import events
+import burst
+import keeper
+import snapshot
+import server
+import unknowns
+import rolldb
+import advisor
+import histogram
+import pareto
+import worker
+import recording
+import watchdog
+import generator
+import races
 import interactions
+import statpanel
+import redraw
+
+from roll import Roll
 
 
 help_text = textwrap.dedent(
@@ -37,14 +59,7 @@ help_text = textwrap.dedent(
 
     ''')
 
-stat_args = {
-    'dont_extend_width': True,
-    'dont_extend_height': True,
-    'always_hide_cursor': False,
-    'wrap_lines': True,
-    'height': D.exact(1),
-    'width': D.exact(38),
-}
+_normal_stat_names = tuple(stat.name for stat in statinfo.Stats.all_normal_stats())
 
 def hpad(height, ch=' ', token=Token.Padding):
     return Window(height=D.exact(height), content=FillControl(ch, token=token))
@@ -52,13 +67,6 @@ def hpad(height, ch=' ', token=Token.Padding):
 def vpad(width, ch=' ', token=Token.Padding):
     return Window(width=D.exact(width), content=FillControl(ch, token=token))
 
-def make_stat_doc(name, value=0):
-    return Document(statinfo.Stats.format(name, value))
-
-def make_stat_window(name):
-    name = statinfo.Stats.get(name).buffername
-    return Window(content=BufferControl(buffer_name=name), **stat_args)
-
 def _is_main_thread():
     return threading.current_thread() is threading.main_thread()
 
@@ -128,19 +136,73 @@ class HelpItem:
 class Ui:
     repeated_message_pattern = re.compile(r'[ ]\((?P<num>[0-9]+)x\)$')
 
-    def __init__(self, hook):
+    def __init__(self, hook, use_worker=False, record_to=None, max_fps=30, score=None, objectives=None):
         self.hook = hook
+        self.max_fps = max_fps
 
         self._built = False
         self._scroll_state = 1
-        self._help_showing = False
-        self._last_roll = None
+        self._info_showing = None
+        self._hist_text = ''
+        self._hist_key = None
+        self._race_text = ''
         self._help_items = []
 
-        self.stat_state = {name: 0 for name in statinfo.names}
-        self.stat_state['Rerolls'] = 0
+        self.roll = Roll()
+        self.rerolls = 0
+        self._pending_roll = None
 
         self.stat_constraints = interactions.StatConstraintState()
+        self.profiler = profiler.SamplingProfiler()
+        self.best_rolls = keeper.BestRolls(score=score)
+        self.pareto_front = (pareto.ParetoFront(objectives) if objectives else
+                             pareto.ParetoFront.for_builds('hunter', 'builder', 'fighter'))
+        self.histograms = histogram.StatHistograms()
+        self.advisor = advisor.StoppingAdvisor(self.best_rolls.score)
+        self.generator = generator.StatGenerator(self.histograms)
+
+        self.race = None
+        # Histograms when the race was set or last learned, only later rolls are learned
+        self._race_since = histogram.StatHistograms()
+        self.race_store = races.RacePriorStore()
+        self.race_table = races.RaceTable.load(self.race_store)
+        self.race_detector = races.RaceDetector(self.race_table)
+
+        self.roll_db = rolldb.RollDatabase()
+
+        self.capture = None
+
+        self.events = events.EventBus(on_error=self.on_error)
+        self._subscribe_events()
+
+        # Rolling and polling move to a separate process, the ui only renders
+        self.worker = None
+        self._worker_counter = None
+
+        if use_worker:
+            self.worker = worker.RollWorker(self._on_worker_record, self._on_worker_message)
+
+        self.server = server.RollServer(hook, self.events, reroll=self._worker_reroll if use_worker else self.reroll)
+
+        self.snapshot = snapshot.SnapshotWriter()
+        self.events.subscribe(self.snapshot.on_event)
+
+        self.recorder = None
+
+        if record_to:
+            self.recorder = recording.Recorder(record_to)
+            self.events.subscribe(self.recorder.on_event)
+
+        self.burst = burst.BurstRoller(
+            hook, on_roll=self._on_burst_sample, on_finish=self._on_burst_finish,
+            on_error=self.on_error,
+            predicate=lambda roll: self.stat_constraints.active() and self.stat_constraints.matches(roll))
+
+        self.watchdog = watchdog.RerollWatchdog(hook, report=self.print)
+
+        self._auto_rolling = False
+        self._prompt_callback = None
+        self.errors = errors.ErrorTracker(errors.ErrorLog('error.txt'))
 
 
     @property
@@ -179,10 +241,89 @@ class Ui:
             self.redraw()
 
 
-    # TODO
-    # Select the default buffer, set some text and request an input?
-    def prompt(self, message, end='>'):
-        ...
+    def prompt(self, message, callback=None, text=''):
+        """
+        Focus the input line and call callback with its text on Enter.
+        Without a callback the input is run as a roll database query.
+        """
+        self.print(message)
+        self._prompt_callback = callback
+
+        buffer = self.buffers[DEFAULT_BUFFER]
+        buffer.reset(Document(text))
+        self._focus(self.stat_buffer_state.last())
+
+    def _submit_prompt(self):
+        buffer = self.buffers[DEFAULT_BUFFER]
+        text = buffer.text
+        callback = self._prompt_callback or self.query_rolls
+
+        self._prompt_callback = None
+        buffer.reset(Document(''))
+
+        if text.strip():
+            callback(text)
+
+    def _format_race(self, stat):
+        if self.race_table.index(self.race) is None:
+            return f'Race: {self.race} (no priors learned yet)'
+
+        return self.race_table.format(self.race, stat, self.stat_constraints.selected())
+
+    def _set_race(self, race):
+        if race != self.race:
+            self._race_since = self.histograms.copy()
+
+        self.race = race
+
+        if race is not None:
+            self.print(f"Race detected: {race}")
+            self.run_in_executor(self._race_changed)
+
+    def _race_changed(self):
+        # Start the cursors on the race's typical values, they can still go anywhere in 1-18
+        if self.race_table.index(self.race) is not None:
+            for stat, value in self.race_table.typical_values(self.race).items():
+                if not self.stat_constraints.bounds(stat):
+                    self.stat_panel.set_cursor(stat, statpanel.VALUE_COLUMN + max(value, 1) - 1)
+
+        self._update_info_text()
+
+    def learn_race(self, race):
+        """
+        Add this session's rolls to a race's priors.
+        """
+        race = race.strip()
+        new = self.histograms.since(self._race_since)
+
+        self.race_table = races.RaceTable(self.race_store.learn(race, new))
+        self.race_detector = races.RaceDetector(self.race_table)
+        self.race_detector.add(self.roll, race)
+
+        self._set_race(race)
+        self._race_since = self.histograms.copy()
+        self.print(f"Learned {race} priors from {new.total} new rolls")
+
+    def query_rolls(self, query):
+        # Queries can take a while on a big database, keep them off the ui thread
+        threading.Thread(name='RollQuery', target=self._run_query, args=(query,), daemon=True).start()
+
+    def _run_query(self, query):
+        t0 = time.perf_counter()
+
+        try:
+            count = self.roll_db.count(query)
+            total = self.roll_db.count()
+        except ValueError as e:
+            self.print(f"Bad query: {e}")
+            return
+        except:
+            # sqlite3 errors like "database is locked" on this thread would print over the ui
+            self.on_error(*sys.exc_info())
+            return
+
+        t1 = time.perf_counter()
+        self.print(f"{count} of {total} rolls match '{query}' ({(t1-t0)*1000:.1f} ms)")
 
 
     def _update_info_text(self, buff=None):
@@ -196,15 +337,46 @@ class Ui:
 
         text = statinfo.extra_info.get(buffername, f'TODO: {buffername} text')
 
+        if buffername in statinfo.names:
+            value = self.roll.value(buffername)
+            self._hist_key = self.histograms.render_key(buffername, value)
+            self._hist_text = self.histograms.format(buffername, value)
+        else:
+            self._hist_key = None
+            self._hist_text = ''
+
+        self._race_text = self._format_race(buffername) if self.race else ''
+
         if text:
-            self.set_info_text(text)
-            self._help_showing = False
+            header = '\n\n'.join(part for part in (self._race_text, self._hist_text) if part)
+            self.set_info_text(text, header=header)
+            self._info_showing = None
+
+    def _refresh_histogram(self):
+        stat = self.stat_buffer_state.current_stat
+
+        if self._info_showing or stat not in statinfo.names:
+            return
+
+        # Only rebuild the info text when the rendered histogram would change
+        if self.histograms.render_key(stat, self.roll.value(stat)) != self._hist_key:
+            self._update_info_text()
+
+    def _toggle_info(self, name, get_text):
+        if self._info_showing == name:
+            self._info_showing = None
+            self._update_info_text()
+            return
+
+        self.set_info_text(get_text())
+        self._info_showing = name
 
 
     def _focus(self, buffer, cli=None):
         cli = cli or self.cli
 
-        cli.focus(buffer)
+        # Stat rows are all drawn by the stat panel, focused through one buffer
+        cli.focus(buffer if buffer == DEFAULT_BUFFER else statpanel.STATS_BUFFER)
         self._update_info_text()
 
 
@@ -246,10 +418,9 @@ class Ui:
                 initial_document=Document(),
                 is_multiline=True),
 
-            **{
-                stat.buffername: Buffer(initial_document=make_stat_doc(stat.name))
-                for stat in statinfo.Stats.all_stats()
-            }
+            statpanel.STATS_BUFFER: Buffer(
+                initial_document=Document(),
+                is_multiline=False, read_only=True)
         }
 
 
@@ -259,17 +430,14 @@ class Ui:
     # BufferControl(lexer=PygmentsLexer(HtmlLexer))
 
     def _gen_layout(self):
-        stat_windows = []
-
-        for stat_group in statinfo.groups:
-            for stat in stat_group:
-                stat_windows.append(make_stat_window(stat))
+        self.stat_panel = statpanel.StatPanelControl(
+            self.stat_constraints, lambda: self.stat_buffer_state.current_stat,
+            on_click=self._on_stat_click)
+        self.stat_constraints.panel = self.stat_panel
 
-            stat_windows.append(vpad(1))
-
-        stat_windows.append(Window(
-            content=BufferControl(buffer_name='REROLLS_STAT_BUFFER'), **stat_args))
-        stat_windows.append(vpad(1))
+        stat_window = Window(
+            content=self.stat_panel, width=D.exact(38),
+            dont_extend_width=True, dont_extend_height=True)
 
         @Condition
         def scroll_cond(cli):
@@ -293,7 +461,7 @@ class Ui:
             hpad(1),
             VSplit([
                 vpad(1),
-                HSplit(stat_windows),
+                stat_window,
                 vpad(2), # idk why there's an extra space on the stats
                 self.info_window,
                 vpad(1)
@@ -308,7 +476,17 @@ class Ui:
 
     def _gen_bindings(self):
         registry = Registry()
-        bind = registry.add_binding
+
+        @Condition
+        def _in_prompt(cli):
+            return cli.current_buffer_name == DEFAULT_BUFFER
+
+        def bind(*keys, **kwargs):
+            # Single character binds would otherwise swallow typing in the prompt
+            if all(isinstance(key, str) and len(key) == 1 for key in keys):
+                kwargs['filter'] = ~_in_prompt & kwargs['filter'] if 'filter' in kwargs else ~_in_prompt
+
+            return registry.add_binding(*keys, **kwargs)
 
         def bind_with_help(*args, name, info='', **kwargs):
             def dec(func):
@@ -318,7 +496,7 @@ class Ui:
                 return bind(*args, **kwargs)(func)
             return dec
 
-        def ensure_cursor_bounds(buffer, pos, valids=None):
+        def ensure_cursor_bounds(pos, valids=None):
             buffer_stat = self.stat_buffer_state.current_stat
 
             if not buffer_stat:
@@ -334,7 +512,7 @@ class Ui:
                 pos = valids[min(pos_index, len(valids)-1)]
 
                 # if we wind up at the same spot, check to see if there's a non-sequential spot
-                if buffer.cursor_position == pos:
+                if self.stat_panel.cursor(buffer_stat) == pos:
                     moving_left = requested_pos < pos
 
                     if moving_left and pos > valids[0]:
@@ -343,15 +521,32 @@ class Ui:
                     if not moving_left and pos < valids[-1]:
                         pos = valids[min(pos_index+1, len(valids)-1)]
 
-            buffer.cursor_position = pos
+            self.stat_panel.set_cursor(buffer_stat, pos)
+
+        def move_cursor(offset):
+            stat = self.stat_buffer_state.current_stat
+
+            if stat:
+                ensure_cursor_bounds(self.stat_panel.cursor(stat) + offset)
+
+        def move_row(new_row):
+            stat = self.stat_buffer_state.current_stat
+            from_stat_buff = _in_normal_stat_buffer(self.cli)
+
+            self._focus(new_row)
+
+            if _in_normal_stat_buffer(self.cli) and from_stat_buff:
+                self.stat_panel.set_cursor(self.stat_buffer_state.current_stat, self.stat_panel.cursor(stat))
+
+            move_cursor(0)
 
         @Condition
         def _in_stat_buffer(cli):
-            return cli.current_buffer_name.endswith("_STAT_BUFFER")
+            return cli.current_buffer_name == statpanel.STATS_BUFFER
 
         @Condition
         def _in_normal_stat_buffer(cli):
-            return not cli.current_buffer_name.startswith(tuple(name.upper() for group in statinfo.groups[2:] for name in group))
+            return self.stat_buffer_state.current_stat in _normal_stat_names
 
 
         # Navigation binds
@@ -359,50 +554,32 @@ class Ui:
         @bind(Keys.Left)
         @self.stat_constraints.listen
         def _(event):
-            buff = event.current_buffer
-            new_pos = buff.cursor_position + buff.document.get_cursor_left_position(count=event.arg)
-            ensure_cursor_bounds(buff, new_pos)
+            move_cursor(-event.arg)
 
         @bind(Keys.Right)
         @self.stat_constraints.listen
         def _(event):
-            buff = event.current_buffer
-            new_pos = buff.cursor_position + buff.document.get_cursor_right_position(count=event.arg)
-            ensure_cursor_bounds(buff, new_pos)
+            move_cursor(event.arg)
 
         @bind(Keys.Up)
         @self.stat_constraints.listen
         def _(event):
-            current_buffer = event.cli.current_buffer
-            from_stat_buff = _in_normal_stat_buffer(event.cli)
-
-            self._focus(self.stat_buffer_state.up())
-
-            buff = event.cli.current_buffer
-            ensure_cursor_bounds(buff, buff.cursor_position)
-
-            if _in_normal_stat_buffer(event.cli) and from_stat_buff:
-                buff.cursor_position = current_buffer.cursor_position
+            move_row(self.stat_buffer_state.up())
 
         @bind(Keys.Down)
         @self.stat_constraints.listen
         def _(event):
-            current_buffer = event.cli.current_buffer
-            from_stat_buff = _in_normal_stat_buffer(event.cli)
-
-            self._focus(self.stat_buffer_state.down())
-
-            buff = event.cli.current_buffer
-            ensure_cursor_bounds(buff, buff.cursor_position)
-
-            if _in_normal_stat_buffer(event.cli) and from_stat_buff:
-                buff.cursor_position = current_buffer.cursor_position
+            move_row(self.stat_buffer_state.down())
 
         @bind(Keys.Enter, filter=_in_stat_buffer)
         @self.stat_constraints.listen
         def _(event):
             pass
 
+        @bind(Keys.Enter, filter=_in_prompt)
+        def _(event):
+            self._submit_prompt()
+
 
         # Control binds
 
@@ -421,25 +598,65 @@ class Ui:
 
         @bind_with_help('?', name='Help', info="Shows the help screen")
         def _(event):
-            if self._help_showing:
-                self._help_showing = False
-                self._update_info_text()
-                return
-
-            self.set_info_text(help_text)
-            self._help_showing = True
+            self._toggle_info('help', self._make_help_text)
 
         @bind_with_help('n', name='Reroll')
         def _(event):
             l = self.reroll()
 
+        @bind_with_help('a', name='Auto roll', info="Start/stop rerolling until the constraints match")
+        def _(event):
+            self.auto_roll()
+
+        @bind_with_help('A', name='Advisor auto stop',
+                        info="Toggle stopping the auto roll when more rolls are not worth it")
+        def _(event):
+            self.advisor.auto_stop = not self.advisor.auto_stop
+            self.print(f"Advisor auto stop {'on' if self.advisor.auto_stop else 'off'}")
+
+        @bind_with_help('B', name='Burst roll',
+                        info="Start/stop burst rerolling until the constraints match, then restore the match")
+        def _(event):
+            self.burst_roll()
+
+        @bind_with_help('b', name='Best rolls', info="Show the best rolls kept this session")
+        def _(event):
+            self._toggle_info('best', self.best_rolls.format)
+
+        @bind_with_help('f', name='Pareto front', info="Show the Pareto front of rolls over the build objectives")
+        def _(event):
+            self._toggle_info('front', self.pareto_front.format)
+
+        @Condition
+        def _best_showing(cli):
+            return self._info_showing == 'best'
+
+        for n in range(1, 10):
+            @bind(str(n), filter=_best_showing)
+            def _(event, index=n-1):
+                self.restore_best(index)
+
+        @bind_with_help('/', name='Query rolls', info="Query the roll database, e.g. Strength >= 16 and Agility >= 15")
+        def _(event):
+            self.prompt("Query rolls (e.g. Strength >= 16 and Agility >= 15):")
+
+        @bind_with_help('g', name='Generate and set',
+                        info="Sample a million plausible rolls within the constraints and write the best scoring one")
+        def _(event):
+            threading.Thread(name='Generator', target=self.generate_and_set, daemon=True).start()
+
+        @bind_with_help('R', name='Learn race priors',
+                        info="Save this session's stat distributions as the priors for a race")
+        def _(event):
+            self.prompt("Race name for this session's rolls:", self.learn_race, text=self.race or '')
+
         @bind_with_help('y', name='Accept Stats', info="Accept current stats in game")
         def _(event):
             ... # TODO
 
         @bind_with_help('r', name='Refresh stats')
         def _(event):
-            self.set_stats(**self.hook.zip(self.hook.read_all()))
+            self.set_roll(self.hook.read_all())
 
         @bind_with_help(Keys.ControlZ, name='Undo', info="TODO: undo buffer")
         def _(event):
@@ -484,6 +701,42 @@ class Ui:
 
             self.run_in_executor(do)
 
+        @bind_with_help('i', name='IPC server', info="Start/stop the local roll server (JSON lines over TCP)")
+        def _(event):
+            if self.server.running:
+                self.server.stop()
+                self.print("Roll server stopped")
+            else:
+                try:
+                    self.server.start()
+                except OSError as e:
+                    self.print(f"Could not start the roll server on {self.server.host}:{self.server.port}: {e}")
+                    return
+
+                self.print(f"Roll server listening on {self.server.host}:{self.server.port}")
+
+        @bind_with_help('u', name='Unknown field capture',
+                        info="Start/stop capturing raw stat blocks and show the unknown byte analysis")
+        def _(event):
+            self.toggle_capture()
+
+        @bind_with_help('C', name='Calibrate', info="Find the fastest reliable reroll pacing for this machine")
+        def _(event):
+            threading.Thread(name='Calibration', target=self.calibrate, daemon=True).start()
+
+        @bind_with_help('F', name='Render stats', info="Show how many redraws were requested and rendered")
+        def _(event):
+            self.print(self.redraw_scheduler.format())
+
+        @bind_with_help('p', name='Profiler', info="Start/stop a profiling capture of all threads")
+        def _(event):
+            if self.profiler.toggle():
+                self.print("Profiler started")
+                return
+
+            prof, collapsed = self.profiler.files
+            self.print(f"Profiler stopped ({self.profiler.sample_count} samples): {prof}, {collapsed}")
+
         @bind(',')
         def _(event):
             self.print("Showing cursor")
@@ -497,7 +750,7 @@ class Ui:
         @bind('-')
         def _(event):
             self.print("got random stats")
-            self.set_stats(**memhook.get_random_stats())
+            self.set_roll(memhook.get_random_stats())
 
         return registry
 
@@ -532,8 +785,13 @@ class Ui:
         self.print("UnReal World Stat Roller v2.0")
         self.print("Press ? for help\n")
 
+        self.redraw_scheduler.start()
         self._memreader = memhook.MemReader(self)
-        self._memreader.start()
+
+        if self.worker:
+            self.worker.start()
+        else:
+            self._memreader.start()
 
         memhook.Cursor.link(self.cli)
 
@@ -545,11 +803,16 @@ class Ui:
 
         self._add_events()
 
+        self.redraw_scheduler = redraw.RedrawScheduler(
+            lambda: self.cli.invalidate(), self.cli_call_soon,
+            on_frame=self._on_frame, max_fps=self.max_fps, on_error=self.on_error)
+
         self.application = Application(
             layout=self.layout,
             buffers=self.buffers,
             key_bindings_registry=self.registry,
             get_title=self._get_window_title,
+            on_render=self.redraw_scheduler.on_render,
             mouse_support=True,
             use_alternate_screen=True)
 
@@ -572,47 +835,349 @@ class Ui:
         try:
             self.cli.run()
         finally:
+            self.redraw_scheduler.stop()
             self._memreader.stop()
+
+            if self.worker:
+                self.worker.stop()
+
             self.cli.eventloop.close()
+            self.errors.log.close()
+            self.server.stop()
+            self.events.close()
+            self.snapshot.close()
+            self.roll_db.close()
+
+            if self.recorder:
+                self.recorder.close()
 
     def redraw(self):
-        if _is_main_thread():
-            self.cli._redraw()
-        else:
-            self.cli.invalidate()
+        """
+        Ask for a redraw from any thread, merged into the next frame.
+        """
+        self.redraw_scheduler.request()
+
+    def cli_call_soon(self, func):
+        self.cli.eventloop.call_from_executor(func)
 
     def run_in_executor(self, func, *args, **kwargs):
         self.cli.eventloop.call_from_executor(lambda: func(*args, **kwargs))
 
+    def _on_frame(self):
+        # Only the latest roll gets displayed, once per frame
+        roll, self._pending_roll = self._pending_roll, None
+
+        if roll is not None:
+            self.set_roll(roll)
+            self._refresh_histogram()
+
     def reroll(self):
-        new_stats = self.hook.reroll()
+        if self.worker:
+            # The new roll comes back through the worker's ring buffer
+            self.worker.reroll()
+            return None
+
+        new_stats = self.watchdog.reroll()
 
-        self.set_stats(**self.hook.zip(new_stats))
-        self.stat_state['Rerolls'] += 1
+        # The counter didn't move, nothing to count or record
+        if new_stats is None:
+            return None
+
+        self.on_roll(*self.hook.last_read)
+
+        if _is_main_thread():
+            self._show_reroll(new_stats)
+        else:
+            self.run_in_executor(self._show_reroll, new_stats)
 
         self.redraw()
+        return new_stats
+
+    def _show_reroll(self, roll):
+        self.set_roll(roll)
+        self.set_stat(statinfo.Stats.rerolls.name, self.rerolls + 1)
+
+    def _pause_reading(self):
+        if self.worker:
+            self.worker.pause()
+        else:
+            self._memreader.pause()
+
+    def _resume_reading(self):
+        if self.worker:
+            self.worker.resume()
+        else:
+            self._memreader.resume()
+
+    def burst_roll(self):
+        if self.burst.running:
+            self.burst.stop(wait=False)
+            return
+
+        self._pause_reading()
+        self.burst.start()
+        self.print("Burst rolling")
+
+    def _on_burst_sample(self, sample):
+        self.events.publish(sample.roll, sample.block, sample.rerolls, sample.timestamp)
+
+    def _on_burst_finish(self, burst):
+        self.print(f"Burst: {burst.observed} rolls in {burst.elapsed:.2f}s "
+                   f"({burst.rate:.1f}/s), {burst.missed} missed")
+
+        try:
+            # Restore before reading resumes, or the in-flight roll gets published first
+            if burst.match is not None:
+                burst.restore()
+                self.run_in_executor(self.set_roll, burst.match.roll)
+                self.print(f"Restored matching roll (reroll {burst.match.rerolls})")
+        except:
+            self.on_error(*sys.exc_info())
+        finally:
+            self._resume_reading()
+
+    def auto_roll(self):
+        """
+        Start or stop rerolling until the stat constraints match (or the
+        advisor says further rolls aren't worth it, if auto stop is on).
+        """
+        bounds = self.stat_constraints.selected()
+
+        if bounds and self.race_table.index(self.race) is not None and not (
+                self._auto_rolling or self.worker and self.worker.rolling):
+            p = self.race_table.feasibility(self.race, bounds)
+            self.print(f"About 1 in {1/p:,.0f} {self.race} rolls match" if p else
+                       f"No {self.race} roll seen so far matches these constraints")
+
+        if self.worker:
+            if self.worker.rolling:
+                self.worker.stop_rolling()
+                self.print("Auto rolling stopped")
+            else:
+                self.worker.start_rolling(self.stat_constraints.selected())
+                self.print("Auto rolling")
+            return
+
+        if self._auto_rolling:
+            self._auto_rolling = False
+            return
+
+        self._auto_rolling = True
+        threading.Thread(name='AutoRoller', target=self._auto_roll, daemon=True).start()
+
+    def _auto_roll(self):
+        self.print("Auto rolling")
+
+        try:
+            while self._auto_rolling:
+                try:
+                    roll = self.reroll()
+                except memhook.RerollStalled as e:
+                    # Keep auto rolling once the game responds again
+                    self.print(f"{e}, waiting")
+                    time.sleep(max(1.0, min(self.watchdog.retry_delay, 5.0)))
+                    continue
+
+                if roll is None:
+                    continue
+
+                if self.stat_constraints.active() and self.stat_constraints.matches(roll):
+                    self.print("Found a roll matching the constraints")
+                    break
+
+                if self.advisor.auto_stop and self.advisor.should_stop():
+                    self.print(f"Stopping, expected gain is {self.advisor.format()}")
+                    break
+            else:
+                self.print("Auto rolling stopped")
+
+        except:
+            self.on_error(*sys.exc_info())
+
+        finally:
+            self._auto_rolling = False
+
+    def on_roll(self, roll, block):
+        """
+        Called from any thread with each new roll read from the game.
+        Publishes it on the event bus if it differs from the last one.
+        """
+        return self.events.publish(roll, block, self.hook._read_rerolls())
+
+    def on_screen_change(self, on_screen):
+        if on_screen:
+            self.print("Character creation screen detected")
+        else:
+            self.print("Not on the character creation screen, idling")
+
+    def _worker_reroll(self):
+        # Server rerolls go through the worker, which owns the game in worker mode
+        block = self.worker.reroll_and_wait()
+        return memhook.decode_block(block) if block is not None else None
+
+    def _on_worker_record(self, record):
+        roll = memhook.decode_block(record.block)
+
+        if self.events.publish(roll, record.block, record.rerolls, record.timestamp) is None:
+            return
+
+        # Count rerolls from the game's counter, which also covers records the ring dropped
+        last, self._worker_counter = self._worker_counter, record.rerolls
+
+        # The block also changes without a reroll, e.g. restoring a roll, count only counter moves
+        delta = (record.rerolls - last) % 0x10000 if last is not None else 0
+
+        if delta:
+            count = max(1, delta // (self.hook.profile.step or 1))
+            self.run_in_executor(lambda: self.set_stat(statinfo.Stats.rerolls.name, self.rerolls + count))
+
+        if self.worker.rolling and self.advisor.auto_stop and self.advisor.should_stop():
+            self.worker.stop_rolling()
+            self.print(f"Stopping, expected gain is {self.advisor.format()}")
+
+    def _on_worker_message(self, message):
+        kind, arg = message
+
+        if kind == 'screen':
+            self.on_screen_change(arg)
+        elif kind == 'matched':
+            self.print(f"Found a roll matching the constraints (reroll {arg})")
+        elif kind == 'info':
+            self.print(arg)
+        elif kind == 'error':
+            self.print(f"Worker error: {arg}")
+
+    def _on_stat_click(self, stat, column):
+        buffername = statinfo.Stats.get(stat).buffername
+
+        if buffername in self.stat_buffer_state.order:
+            self._focus(self.stat_buffer_state.goto(self.stat_buffer_state.order.index(buffername)))
+            self.stat_panel.set_cursor(stat, column)
+
+    def _subscribe_events(self):
+        self.events.subscribe(self._record_roll)
+        self.events.subscribe(self.generator.on_event)
+        self.events.subscribe(self._display_roll)
+        self.events.subscribe(lambda event: self.pareto_front.push(event.roll, event.block),
+                              queued=True)
+
+    def _record_roll(self, event):
+        race_id = self.hook.read_race(event.block)
+        self.race_detector.add(event.roll, None if race_id is None else races.race_name(race_id))
+
+        if self.race_detector.race != self.race:
+            self._set_race(self.race_detector.race)
+
+        self.histograms.add(event.roll)
+        self.best_rolls.push(event.roll, event.block)
+        self.advisor.add(event.roll)
+        self.roll_db.add(event.roll, event.rerolls, event.timestamp)
+
+        if self.capture is not None:
+            self.capture.add(event.block)
+
+    def _display_roll(self, event):
+        self._pending_roll = event.roll
+        self.redraw()
+
+    def calibrate(self):
+        self._pause_reading()
+
+        try:
+            profile = self.hook.calibrate(report=self.print)
+            self.print(f"Calibrated: {profile.press_gap*1000:.0f} ms gap, "
+                       f"{profile.press_delay*1000:.0f} ms key hold, "
+                       f"polling every {profile.interval*1000:.0f} ms")
+        except:
+            self.on_error(*sys.exc_info())
+        finally:
+            self._resume_reading()
+
+    def generate_and_set(self, candidates=1_000_000):
+        try:
+            t0 = time.perf_counter()
+            roll = self.generator.best(candidates, self.stat_constraints.selected(),
+                                       self.best_rolls.score, base=self.roll)
+            t1 = time.perf_counter()
+
+            self.hook.write_all(roll)
+            self.run_in_executor(self.set_roll, roll)
+            self.print(f"Set the best of {candidates:,} sampled rolls in {t1-t0:.2f}s")
+        except:
+            self.on_error(*sys.exc_info())
+
+    def toggle_capture(self):
+        if self.capture is None:
+            self.capture = unknowns.BlockCapture()
+            self.print("Capturing raw stat blocks, press u again to analyze")
+            return
+
+        capture, self.capture = self.capture, None
+
+        if len(capture) < 2:
+            self.print("Not enough rolls captured")
+            return
+
+        path = capture.save()
+        report = unknowns.format_report(unknowns.analyze(capture.array()), len(capture))
+
+        self.set_info_text(report)
+        self._info_showing = 'unknowns'
+        self.print(f"Captured {len(capture)} rolls to {path}")
+
+    def restore_best(self, index):
+        entries = self.best_rolls.best()
+
+        if index >= len(entries):
+            return
+
+        entry = entries[index]
+        self.hook.write_all(block=entry.block)
+        self.set_roll(entry.roll)
+        self.print(f"Restored roll #{index+1} (score {entry.score:.1f})")
+
+    def _set_stat_row(self, stat, value):
+        suffix = ''
+
+        if stat == statinfo.Stats.rerolls.name:
+            if self.advisor.count > 1:
+                suffix = self.advisor.format()
+
+            if self.watchdog.stalls:
+                suffix = f'{suffix} {self.watchdog.format()}'.strip()
+
+        self.stat_panel.set_row(stat, value, suffix)
 
     def set_stat(self, stat, value):
-        self.stat_state[stat] = value
+        if stat == statinfo.Stats.rerolls.name:
+            self.rerolls = value
+        else:
+            self.roll = self.roll.replace({stat: value})
 
-        buffer = self.buffers[statinfo.Stats.get(stat).buffername]
-        cursor = buffer.cursor_position
+        self._set_stat_row(stat, value)
 
-        # If cursor position is being funky I can just set the position on the doc
-        buffer.reset(make_stat_doc(stat, value))
-        buffer.cursor_position = cursor
+    def set_roll(self, roll):
+        last, self.roll = self.roll, roll
+
+        # Only touch the rows whose values changed
+        for stat, old, new in zip(statinfo.names, last, roll):
+            if old != new:
+                self._set_stat_row(stat, new)
 
     def set_stats(self, **stats):
-        for stat, value in stats.items():
-            self.set_stat(stat, value)
+        self.set_roll(self.roll.replace(stats))
 
     def _make_info_text(self, text):
         parts = str(text).strip().split('\n\n')
         filled_parts = [textwrap.fill(t, 35) for t in parts]
         return '\n\n'.join(filled_parts)
 
-    def set_info_text(self, text):
+    def set_info_text(self, text, header=''):
         text = self._make_info_text(text)
+
+        if header:
+            text = header + '\n\n' + text
+
         self.buffers['INFO_BUFFER'].reset(Document(text, cursor_position=0))
 
     def append_info_text(self, text, sep='\n'):
@@ -629,11 +1194,17 @@ class Ui:
         return help_text
 
     def on_error(self, *args):
-        self.print(f"An error has occurred: {args[1]}")
-        traceback.print_exception(*args)
+        count = self.errors.record(*args)
+
+        if count == 1:
+            self.print(f"An error has occurred: {args[1]}")
+            traceback.print_exception(*args)
+
+        elif self.errors.should_report(count):
+            self.print(f"An error has occurred: {args[1]} (seen {count} times)")
+
+        return count
 
 # TODO:
-#   Race info and stat bounds helpers/warnings
 #   Cheat mode, turn all the text hacker green
 #     Undo button (stat history)
-#     Custom roll bounds and distribution (generate and set)
@@ -0,0 +1,122 @@
+import time
+import threading
+
+import numpy as np
+
+import statinfo
+
+from memhook import _stat_fields, _STAT_BLOCK_SIZE
+
+# Byte offsets in the stat block not covered by a known stat
+unknown_offsets = tuple(sorted(
+    set(range(_STAT_BLOCK_SIZE)) -
+    {offset + i for offset, fmt in _stat_fields for i in range(fmt.size)}))
+
+
+class BlockCapture:
+    """
+    Records full raw stat blocks, one per roll, into a flat buffer.
+    """
+
+    def __init__(self, limit=20000):
+        self.limit = limit
+
+        self._data = bytearray()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data) // _STAT_BLOCK_SIZE
+
+    @property
+    def full(self):
+        return len(self) >= self.limit
+
+    def add(self, block):
+        with self._lock:
+            if not self.full:
+                self._data += block
+
+    def array(self):
+        with self._lock:
+            return np.frombuffer(bytes(self._data), dtype=np.uint8).reshape(-1, _STAT_BLOCK_SIZE)
+
+    def save(self, path=None):
+        path = path or time.strftime('capture-%Y%m%d-%H%M%S.bin')
+
+        with self._lock, open(path, 'wb') as f:
+            f.write(self._data)
+
+        return path
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return np.fromfile(f, dtype=np.uint8).reshape(-1, _STAT_BLOCK_SIZE)
+
+
+def decode_stats(blocks):
+    """
+    Known stat values for an (n, 48) block array, as an (n, 14) array.
+    """
+    columns = []
+
+    for offset, fmt in _stat_fields:
+        raw = blocks[:, offset:offset + fmt.size].astype(np.int64)
+        columns.append(raw @ (256 ** np.arange(fmt.size, dtype=np.int64)))
+
+    return np.stack(columns, axis=1)
+
+
+def _standardize(x):
+    x = x.astype(np.float64)
+    std = x.std(axis=0)
+    std[std == 0] = np.inf
+
+    return (x - x.mean(axis=0)) / std
+
+
+def analyze(blocks):
+    """
+    Per unknown byte: value distribution, fraction of rolls it changed on and
+    its correlation with each known stat.
+    """
+    unknown = blocks[:, list(unknown_offsets)]
+    n = len(blocks)
+
+    correlations = _standardize(unknown).T @ _standardize(decode_stats(blocks)) / max(n, 1)
+    changes = np.count_nonzero(np.diff(unknown, axis=0), axis=0) / max(n - 1, 1)
+
+    report = []
+
+    for i, offset in enumerate(unknown_offsets):
+        counts = np.bincount(unknown[:, i], minlength=256)
+        values = np.flatnonzero(counts)
+
+        report.append({
+            'offset': offset,
+            'distribution': dict(zip(values.tolist(), counts[values].tolist())),
+            'changes': float(changes[i]),
+            'correlations': dict(zip(statinfo.names, correlations[i].tolist())),
+        })
+
+    return report
+
+
+def format_report(report, rolls, top=2, max_values=6):
+    lines = [f'Unknown stat block bytes over {rolls} rolls:']
+
+    for entry in report:
+        dist = entry['distribution']
+        shown = sorted(dist.items(), key=lambda kv: -kv[1])[:max_values]
+        values = ', '.join(f'{v:02X}x{c}' for v, c in shown) + (' ...' if len(dist) > max_values else '')
+
+        if len(dist) == 1:
+            lines.append(f"+{entry['offset']:02d}: constant {values}")
+            continue
+
+        strongest = sorted(entry['correlations'].items(), key=lambda kv: -abs(kv[1]))[:top]
+        corr = ', '.join(f'{name[:3]} {r:+.2f}' for name, r in strongest)
+
+        lines.append(f"+{entry['offset']:02d}: {values}; changes {entry['changes']:.0%}; r {corr}")
+
+    return '\n\n'.join(lines)
@@ -0,0 +1,129 @@
+import time
+
+import memhook
+
+
+class RerollWatchdog:
+    """
+    Rerolls through the hook and recovers from stalls.
+
+    A reroll that leaves the game's reroll counter flat returns None so the
+    caller can retry without counting it; after `stall_after` flat attempts
+    in a row the graded recovery steps run in order until one gets the
+    counter moving again:
+
+        reload     re-resolve the game window and process
+        focus      focus the game and press 'n' as a real key press
+        addresses  reload and check the stat block still holds a roll
+
+    If every step fails RerollStalled is raised, and until `backoff` seconds
+    have passed (doubling after each failed recovery, up to `max_backoff`)
+    further stalls raise it again without rerunning the recovery, so callers
+    can wait and retry.
+    """
+
+    def __init__(self, hook, *, stall_after=3, settle=0.5, backoff=5.0, max_backoff=60.0, report=print):
+        self.hook = hook
+        self.stall_after = stall_after
+        self.settle = settle
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.report = report
+
+        self.streak = 0
+        self.stalls = 0
+        self.failures = 0
+        self.recovery_time = 0.0
+
+        self._next_backoff = backoff
+        self._retry_at = 0.0
+
+        self.steps = (
+            ('reload', self._reload, self.hook._press_roll),
+            ('focus', self.hook.focus_game, self.hook._press_roll_focused),
+            ('addresses', self._verify_addresses, self.hook._press_roll))
+
+    def reroll(self):
+        try:
+            stats = self.hook.reroll()
+        except memhook.RerollStalled:
+            self.streak += 1
+
+            if self.streak < self.stall_after:
+                return None
+
+            self.streak = 0
+
+            if self.retry_delay:
+                raise memhook.RerollStalled(f"Rerolls stalled, next recovery in {self.retry_delay:.0f}s")
+
+            return self._recover()
+
+        self.streak = 0
+        return stats
+
+    @property
+    def retry_delay(self):
+        """
+        Seconds until a stall may run the recovery steps again.
+        """
+        return max(0.0, self._retry_at - time.perf_counter())
+
+    def format(self):
+        return f'{self.stalls} stalls ({self.recovery_time:.1f}s)'
+
+    def _reload(self):
+        if not self.hook.reload():
+            raise RuntimeError("Game window not found")
+
+    def _verify_addresses(self):
+        self._reload()
+        roll, block = self.hook.read_block()
+
+        if not self.hook.on_creation_screen(roll, block):
+            raise RuntimeError("The stat block address no longer holds a roll")
+
+    def _try_roll(self, press):
+        before = self.hook._read_rerolls()
+        press()
+
+        deadline = time.perf_counter() + self.settle
+
+        while time.perf_counter() < deadline:
+            if self.hook._read_rerolls() != before:
+                return True
+
+            time.sleep(0.01)
+
+        return False
+
+    def _recover(self):
+        self.stalls += 1
+        t0 = time.perf_counter()
+
+        self.report(f"Rerolls stalled after {self.stall_after} attempts, recovering")
+
+        try:
+            for name, prepare, press in self.steps:
+                try:
+                    prepare()
+
+                    if self._try_roll(press):
+                        self._next_backoff = self.backoff
+                        self.report(f"Recovered by {name} in {time.perf_counter() - t0:.2f}s")
+                        return self.hook.read_all()
+
+                except Exception as e:
+                    self.report(f"Recovery step {name} failed: {e}")
+
+                finally:
+                    if name == 'focus':
+                        self.hook.focus_this()
+
+            self.failures += 1
+            self._retry_at = time.perf_counter() + self._next_backoff
+            self._next_backoff = min(self._next_backoff * 2, self.max_backoff)
+            raise memhook.RerollStalled(f"Rerolls still stalled after {len(self.steps)} recovery steps")
+
+        finally:
+            self.recovery_time += time.perf_counter() - t0
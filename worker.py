@@ -0,0 +1,338 @@
+import time
+import queue
+import struct
+import threading
+import multiprocessing
+
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+"""
+Shared memory ring buffer layout (little endian):
+
+Header:  count     Q   records written so far
+         capacity  I
+
+Slot:    sequence  Q   2*i+1 while record i is being written, 2*i+2 when done
+         rerolls   I
+         timestamp d
+         block     48s raw stat block
+
+Record i lives in slot i % capacity.  The reader checks the slot sequence
+before and after copying and drops records the writer has already lapped.
+"""
+
+_header = struct.Struct('<QI')
+_seq = struct.Struct('<Q')
+_payload = struct.Struct('<Id48s')
+
+_SLOT_SIZE = _seq.size + _payload.size
+
+Record = namedtuple('Record', 'rerolls timestamp block')
+
+
+def ring_size(capacity):
+    return _header.size + capacity * _SLOT_SIZE
+
+
+class RingWriter:
+    def __init__(self, buf, capacity=None):
+        self.buf = buf
+
+        if capacity is None:
+            self.count, self.capacity = _header.unpack_from(buf, 0)
+        else:
+            self.count, self.capacity = 0, capacity
+            _header.pack_into(buf, 0, 0, capacity)
+
+    def write(self, rerolls, timestamp, block):
+        i = self.count
+        offset = _header.size + (i % self.capacity) * _SLOT_SIZE
+
+        _seq.pack_into(self.buf, offset, 2 * i + 1)
+        _payload.pack_into(self.buf, offset + _seq.size, rerolls or 0, timestamp, bytes(block))
+        _seq.pack_into(self.buf, offset, 2 * i + 2)
+
+        self.count = i + 1
+        _header.pack_into(self.buf, 0, self.count, self.capacity)
+
+
+class RingReader:
+    def __init__(self, buf):
+        self.buf = buf
+        self.next = 0
+        self.dropped = 0
+
+    def read_new(self):
+        count, capacity = _header.unpack_from(self.buf, 0)
+
+        # Writer lapped us, skip to the oldest record still in the ring
+        if count - self.next > capacity:
+            self.dropped += count - self.next - capacity
+            self.next = count - capacity
+
+        records = []
+
+        for i in range(self.next, count):
+            offset = _header.size + (i % capacity) * _SLOT_SIZE
+            expected = 2 * i + 2
+
+            if _seq.unpack_from(self.buf, offset)[0] == expected:
+                record = Record(*_payload.unpack_from(self.buf, offset + _seq.size))
+
+                if _seq.unpack_from(self.buf, offset)[0] == expected:
+                    records.append(record)
+                    continue
+
+            self.dropped += 1
+
+        self.next = count
+        return records
+
+
+def _matches(roll, bounds):
+    return all(low <= roll.value(stat) <= high for stat, (low, high) in bounds.items())
+
+
+def _run_worker(shm_name, commands, results, interval, idle_interval=2.0):
+    """
+    Worker process: owns the Hook, polls the game and runs the roll loop,
+    writing every new roll into the ring buffer.
+    """
+    import memhook
+    import watchdog
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = RingWriter(shm.buf)
+    hook = memhook.Hook()
+    guard = watchdog.RerollWatchdog(hook, report=lambda message: results.put(('info', message)))
+
+    rolling = paused = False
+    on_screen = True
+    bounds = {}
+    last = None
+
+    try:
+        while True:
+            try:
+                cmd, arg = commands.get(timeout=0 if rolling else interval)
+            except queue.Empty:
+                cmd, arg = None, None
+
+            if cmd == 'stop':
+                return
+
+            elif cmd == 'roll':
+                rolling, bounds = True, arg or {}
+
+            elif cmd == 'halt':
+                rolling = False
+
+            elif cmd == 'pause':
+                rolling, paused = False, True
+
+            elif cmd == 'resume':
+                paused = False
+
+            if paused:
+                continue
+
+            try:
+                if not hook.is_running():
+                    time.sleep(1)
+                    hook.reload()
+                    continue
+
+                rerolled = None
+
+                if rolling or cmd == 'reroll':
+                    rerolled = guard.reroll()
+
+                roll, block = hook.read_block()
+
+                # Answer reroll_and_wait directly, the ring only gets rolls that changed
+                if cmd == 'reroll' and arg is not None:
+                    results.put(('rerolled', (arg, bytes(block) if rerolled is not None else None)))
+
+                if hook.on_creation_screen(roll, block) != on_screen:
+                    on_screen = not on_screen
+                    rolling = rolling and on_screen
+                    results.put(('screen', on_screen))
+
+                if not on_screen:
+                    time.sleep(idle_interval)
+                    continue
+
+                if roll is last:
+                    continue
+
+                last = roll
+                rerolls = hook._read_rerolls()
+                ring.write(rerolls, time.time(), block)
+
+                if rolling and bounds and _matches(roll, bounds):
+                    rolling = False
+                    results.put(('matched', rerolls))
+
+            except memhook.RerollStalled as e:
+                # Not fatal, keep rolling once the watchdog's backoff is over
+                results.put(('info', f"{e}, waiting"))
+                time.sleep(max(1.0, min(guard.retry_delay, 5.0)))
+
+                if cmd == 'reroll' and arg is not None:
+                    results.put(('rerolled', (arg, None)))
+
+            except Exception as e:
+                results.put(('error', f'{type(e).__name__}: {e}'))
+                rolling = False
+
+                if cmd == 'reroll' and arg is not None:
+                    results.put(('rerolled', (arg, None)))
+
+                time.sleep(interval)
+    finally:
+        del ring
+        shm.close()
+
+
+class RollWorker:
+    """
+    Runs rolling and memory reading in a separate process so ui work and GC
+    pauses in the ui process can't slow the roll loop down.  New rolls come
+    back through a shared memory ring buffer and are handed to `on_record`,
+    other worker messages go to `on_message`.
+    """
+
+    def __init__(self, on_record, on_message, *, capacity=4096, interval=0.1, drain_interval=0.005):
+        self.on_record = on_record
+        self.on_message = on_message
+        self.capacity = capacity
+        self.interval = interval
+        self.drain_interval = drain_interval
+
+        self.rolling = False
+
+        self._shm = None
+        self._reader = None
+        self._process = None
+        self._commands = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._running = threading.Event()
+        self._drain_thread = None
+        self._reroll_cond = threading.Condition()
+        self._reroll_seq = 0
+        self._waiting = set()
+        self._rerolled = {}
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    @property
+    def dropped(self):
+        return self._reader.dropped if self._reader else 0
+
+    def start(self):
+        self._shm = shared_memory.SharedMemory(create=True, size=ring_size(self.capacity))
+        RingWriter(self._shm.buf, self.capacity)
+        self._reader = RingReader(self._shm.buf)
+
+        self._process = multiprocessing.Process(
+            name='RollWorker', target=_run_worker, daemon=True,
+            args=(self._shm.name, self._commands, self._results, self.interval))
+        self._process.start()
+
+        self._running.set()
+        self._drain_thread = threading.Thread(name='RollWorkerDrain', target=self._drain, daemon=True)
+        self._drain_thread.start()
+
+    def _drain(self):
+        while self.running:
+            for record in self._reader.read_new():
+                self.on_record(record)
+
+            while True:
+                try:
+                    message = self._results.get_nowait()
+                except queue.Empty:
+                    break
+
+                if message[0] == 'rerolled':
+                    with self._reroll_cond:
+                        seq, block = message[1]
+
+                        # Late answers to a wait that timed out are dropped
+                        if seq in self._waiting:
+                            self._rerolled[seq] = block
+                            self._reroll_cond.notify_all()
+                    continue
+
+                if message[0] == 'matched' or message[0] == 'error':
+                    self.rolling = False
+
+                self.on_message(message)
+
+            time.sleep(self.drain_interval)
+
+    def send(self, cmd, arg=None):
+        self._commands.put((cmd, arg))
+
+    def reroll(self):
+        self.send('reroll')
+
+    def reroll_and_wait(self, timeout=2.0):
+        """
+        Reroll and return the stat block read right after it, or None if the
+        reroll counter didn't move, for callers that need the new roll back
+        (the roll server).
+        """
+        with self._reroll_cond:
+            self._reroll_seq += 1
+            seq = self._reroll_seq
+            self._waiting.add(seq)
+            self.send('reroll', seq)
+
+            try:
+                if not self._reroll_cond.wait_for(lambda: seq in self._rerolled, timeout):
+                    raise TimeoutError("The worker didn't answer the reroll")
+
+                return self._rerolled.pop(seq)
+            finally:
+                self._waiting.discard(seq)
+
+    def start_rolling(self, bounds):
+        self.rolling = True
+        self.send('roll', bounds)
+
+    def stop_rolling(self):
+        self.rolling = False
+        self.send('halt')
+
+    def pause(self):
+        """
+        Stop touching the game until resume(), e.g. while the ui process
+        drives it directly for calibration or a burst.
+        """
+        self.rolling = False
+        self.send('pause')
+
+    def resume(self):
+        self.send('resume')
+
+    def stop(self):
+        if not self.running:
+            return
+
+        self.send('stop')
+        self._running.clear()
+        self._process.join(2)
+
+        if self._process.is_alive():
+            self._process.terminate()
+
+        # The drain thread reads the shared memory, it has to be gone before it's released
+        self._drain_thread.join()
+
+        self._reader = None
+        self._shm.close()
+        self._shm.unlink()